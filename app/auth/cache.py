@@ -0,0 +1,169 @@
+"""
+    flaskngo.auth.cache
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Process-local cache of already verified authentication tokens.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+# Third-party imports
+# BITSON imports
+
+
+CachedToken = namedtuple('CachedToken', ['user_id', 'claims', 'snapshot',
+                                         'roles', 'token_exp', 'expires_at'])
+
+
+class TokenCache(object):
+    """LRU cache with TTL for verified tokens.
+
+    Entries are keyed by the token digest and keep the decoded claims plus a
+    snapshot of the user flags checked by :func:`verify_password`, so a hit
+    needs neither the signature check nor a database round trip. Entries of a
+    user are evicted as soon as a commit changes that user row.
+
+    :param maxsize: max number of cached tokens, ``0`` disables the cache.
+    :param ttl: max seconds an entry is trusted without reloading the user.
+    """
+
+    def __init__(self, maxsize=4096, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = dict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config.get('AUTH_TOKEN_CACHE_SIZE', self.maxsize)
+        self.ttl = app.config.get('AUTH_TOKEN_CACHE_TTL', self.ttl)
+        self.clear()
+
+    @staticmethod
+    def digest(token):
+        if isinstance(token, str):
+            token = token.encode('utf-8')
+        return hashlib.sha256(token).digest()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._discard(digest)
+                return None
+            self._entries.move_to_end(digest)
+            return entry
+
+    def set(self, digest, user_id, claims, snapshot, roles=None,
+            token_exp=None):
+        """Stores a verified token.
+
+        :param roles: frozenset with the role names embedded in the token.
+        :param token_exp: token expiration as a UNIX timestamp, entries never
+                          outlive the token itself.
+        """
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        entry = CachedToken(user_id=user_id, claims=claims, snapshot=snapshot,
+                            roles=roles, token_exp=token_exp,
+                            expires_at=time.monotonic() + ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return entry
+        with self._lock:
+            self._discard(digest)
+            self._entries[digest] = entry
+            self._by_user.setdefault(user_id, set()).add(digest)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+        return entry
+
+    def discard(self, digest):
+        with self._lock:
+            self._discard(digest)
+
+    def evict_users(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                for digest in self._by_user.pop(user_id, ()):
+                    self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        digests = self._by_user.get(entry.user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[entry.user_id]
+
+
+class RejectedTokenCache(object):
+    """Bounded cache of recently rejected token digests.
+
+    Repeated invalid, expired or revoked tokens are then rejected without
+    verifying them again. Only permanent rejections belong here, a token of a
+    deactivated user may become valid again and must not be cached.
+
+    :param maxsize: max number of digests kept, ``0`` disables the cache.
+    :param ttl: seconds a digest stays rejected.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config.get('AUTH_REJECTED_CACHE_SIZE', self.maxsize)
+        self.ttl = app.config.get('AUTH_REJECTED_CACHE_TTL', self.ttl)
+        self.clear()
+
+    def __contains__(self, digest):
+        expires_at = self._entries.get(digest)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            with self._lock:
+                self._entries.pop(digest, None)
+            return False
+        return True
+
+    def add(self, digest):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._entries[digest] = time.monotonic() + self.ttl
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+rejected_tokens = RejectedTokenCache()
@@ -17,6 +17,18 @@ from .models import verify_password
 from app.errors import unauthorized, forbidden
 
 
+def current_roles():
+    """Role names of the logged user as a frozenset.
+
+    Taken from the token claims when the token embeds them, otherwise loaded
+    once per request from the user roles.
+    """
+    roles = getattr(g, 'current_roles', None)
+    if roles is None:
+        roles = g.current_roles = frozenset(g.current_user.list_roles_names())
+    return roles
+
+
 def roles_required(*roles):
     """Decorator which specifies that a user must have all the specified roles.
     Example::
@@ -31,14 +43,14 @@ def roles_required(*roles):
 
     :param roles: The required roles
     """
+    required = frozenset(roles)
 
     def wrapper(fn):
         @wraps(fn)
         def decorated_view(*args, **kwargs):
             if verify_password():
-                for role in roles:
-                    if role not in g.current_user.list_roles_names():
-                        return forbidden('Not enough permissions')
+                if not required <= current_roles():
+                    return forbidden('Not enough permissions')
                 return fn(*args, **kwargs)
             else:
                 return unauthorized('Invalid credentials')
@@ -61,15 +73,15 @@ def roles_accepted(*roles):
 
     :param roles: The possible roles
     """
+    accepted = frozenset(roles)
 
     def wrapper(fn):
         @wraps(fn)
         def decorated_view(*args, **kwargs):
             if verify_password():
-                for role in roles:
-                    if role in g.current_user.list_roles_names():
-                        return fn(*args, **kwargs)
-                return forbidden('Not enough permissions')
+                if accepted.isdisjoint(current_roles()):
+                    return forbidden('Not enough permissions')
+                return fn(*args, **kwargs)
             else:
                 return unauthorized('Invalid Credentials')
         return decorated_view
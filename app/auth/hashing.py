@@ -0,0 +1,277 @@
+"""
+    flaskngo.auth.hashing
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Password hashing off the request threads.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import atexit
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+# Third-party imports
+from passlib.apps import custom_app_context
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+# BITSON imports
+from app.metrics import metrics
+
+# Strongest first, the schemes `tune_hashing` may choose from. All of them
+# stay verifiable so hashes made with a previous setting keep working.
+CANDIDATE_SCHEMES = ['bcrypt', 'pbkdf2_sha512', 'sha512_crypt', 'sha256_crypt']
+
+_contexts = dict()
+
+
+class HashingUnavailable(Exception):
+    """Raised when a hash can't be made right now, i.e. the worker pool
+    broke (it is rebuilt for the next hash)."""
+
+
+class HashingQueueFull(HashingUnavailable):
+    """Raised when every hashing slot is busy."""
+
+
+class HashingTimeout(HashingUnavailable):
+    """Raised when a hash takes longer than the executor `timeout`."""
+
+
+def build_context(scheme=None, rounds=None):
+    """Password context for a tuned `scheme` & `rounds`.
+
+    Hashes made with another scheme or another number of rounds are reported
+    by `needs_update`, so they get rehashed on the next successful login.
+    Without a scheme the stock `custom_app_context` is used.
+    """
+    if not scheme:
+        return custom_app_context.copy()
+    schemes = [scheme] + [name for name in CANDIDATE_SCHEMES if name != scheme]
+    options = dict(schemes=schemes, default=scheme, deprecated='auto')
+    if rounds:
+        options.update({
+            '{}__default_rounds'.format(scheme): rounds,
+            '{}__min_desired_rounds'.format(scheme): rounds,
+            '{}__max_desired_rounds'.format(scheme): rounds,
+        })
+    return CryptContext(**options)
+
+
+def _get_context(policy):
+    context = _contexts.get(policy)
+    if context is None:
+        context = _contexts[policy] = CryptContext.from_string(policy)
+    return context
+
+
+def _run(policy, method, *args):
+    """Runs a context method in a pool worker, timing the hash itself."""
+    context = _get_context(policy)
+    started = time.time()
+    result = getattr(context, method)(*args)
+    return result, started, time.time()
+
+
+def _time_hash(handler, rounds, samples):
+    handler = handler.using(rounds=rounds)
+    timings = list()
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.hash('tune-hashing-sample')
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def fit_rounds(scheme, budget, samples=3):
+    """Max rounds of `scheme` whose median hash time stays within `budget`.
+
+    :returns: a `(rounds, seconds)` tuple.
+    """
+    handler = get_crypt_handler(scheme)
+    log2 = handler.rounds_cost == 'log2'
+    rounds = handler.default_rounds
+    elapsed = _time_hash(handler, rounds, samples)
+    if log2:
+        rounds += int(math.floor(math.log2(budget / elapsed)))
+    else:
+        rounds = int(rounds * budget / elapsed)
+    rounds = max(handler.min_rounds, min(rounds, handler.max_rounds))
+    elapsed = _time_hash(handler, rounds, samples)
+    while elapsed > budget and rounds > handler.min_rounds:
+        rounds = rounds - 1 if log2 else max(int(rounds * 0.9),
+                                             handler.min_rounds)
+        elapsed = _time_hash(handler, rounds, samples)
+    return rounds, elapsed
+
+
+def tune(budget, schemes=None, samples=3):
+    """Benchmarks the candidate schemes on this host.
+
+    Picks the strongest scheme able to run at least its recommended rounds
+    within `budget` seconds, or the fastest setting found otherwise.
+
+    :returns: a list of `(scheme, rounds, seconds, recommended)` tuples, the
+              chosen one first.
+    """
+    results = list()
+    for scheme in schemes or CANDIDATE_SCHEMES:
+        handler = get_crypt_handler(scheme)
+        if hasattr(handler, 'has_backend') and not handler.has_backend():
+            continue
+        rounds, elapsed = fit_rounds(scheme, budget, samples=samples)
+        results.append((scheme, rounds, elapsed,
+                        rounds >= handler.default_rounds))
+    results.sort(key=lambda result: not result[3])
+    return results
+
+
+class HashingExecutor(object):
+    """Bounded process pool for the (deliberately slow) password hashes.
+
+    At most `workers + queue_size` hashes are running or waiting at any time,
+    anything beyond that raises :class:`HashingQueueFull` right away instead
+    of piling up request threads. Timeouts and pool crashes raise other
+    :class:`HashingUnavailable` errors. With `workers = 0` hashes run
+    inline.
+
+    :param workers: number of worker processes.
+    :param queue_size: number of hashes allowed to wait for a free worker.
+    :param timeout: max seconds a request waits for its hash.
+    """
+
+    def __init__(self, workers=0, queue_size=0, timeout=None):
+        self.context = build_context()
+        self.policy = self.context.to_string()
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASHING_WORKERS', self.workers)
+        self.queue_size = app.config.get('PASSWORD_HASHING_QUEUE_SIZE',
+                                         self.queue_size)
+        self.timeout = app.config.get('PASSWORD_HASHING_TIMEOUT', self.timeout)
+        self.context = build_context(
+            scheme=app.config.get('PASSWORD_HASHING_SCHEME'),
+            rounds=app.config.get('PASSWORD_HASHING_ROUNDS'))
+        self.policy = self.context.to_string()
+        self.shutdown()
+
+    def hash(self, password):
+        return self.run('hash', password)
+
+    def verify(self, password, password_hash):
+        return self.run('verify', password, password_hash)
+
+    def needs_update(self, password_hash):
+        """Whether a hash was made with an outdated scheme or cost."""
+        return bool(password_hash) and self.context.needs_update(password_hash)
+
+    def rehash_async(self, password, callback):
+        """Hashes `password` in background, then calls `callback(new_hash)`
+        from a background thread. Skipped if the pool is busy, the hash will
+        be updated on a later login."""
+        def store(new_hash):
+            metrics.incr('hashing.rehashed')
+            threading.Thread(target=callback, args=(new_hash,),
+                             daemon=True).start()
+
+        if self.workers <= 0:
+            threading.Thread(target=lambda: callback(self.hash(password)),
+                             daemon=True).start()
+            metrics.incr('hashing.rehashed')
+            return
+        try:
+            future = self.submit('hash', password)
+        except HashingUnavailable:
+            return
+        future.add_done_callback(
+            lambda done: None if done.cancelled() or done.exception()
+            else store(done.result()[0]))
+
+    def run(self, method, *args):
+        if self.workers <= 0:
+            result, started, finished = _run(self.policy, method, *args)
+            metrics.observe('hashing.hash_time', finished - started)
+            return result
+        pool, future = self._submit(method, *args)
+        try:
+            return future.result(timeout=self.timeout)[0]
+        except TimeoutError:
+            future.cancel()  # frees its slot if it is still waiting
+            metrics.incr('hashing.timeouts')
+            raise HashingTimeout()
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise HashingUnavailable()
+
+    def submit(self, method, *args):
+        return self._submit(method, *args)[1]
+
+    def _submit(self, method, *args):
+        pool = self._get_pool()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            metrics.incr('hashing.rejected')
+            raise HashingQueueFull()
+        submitted = time.time()
+
+        def done(future):
+            slots.release()
+            if future.cancelled() or future.exception():
+                metrics.incr('hashing.failed')
+                return
+            _, started, finished = future.result()
+            metrics.observe('hashing.queue_wait', max(started - submitted, 0))
+            metrics.observe('hashing.hash_time', finished - started)
+
+        try:
+            future = pool.submit(_run, self.policy, method, *args)
+        except BrokenProcessPool:
+            slots.release()
+            self._discard_pool(pool)
+            raise HashingUnavailable()
+        future.add_done_callback(done)
+        return pool, future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def _discard_pool(self, pool):
+        """Drops a broken pool, the next hash starts a new one."""
+        with self._lock:
+            if self._pool is not pool:  # already replaced
+                return
+            self._pool = None
+        metrics.incr('hashing.pool_rebuilds')
+        pool.shutdown(wait=False)
+
+    def _get_pool(self):
+        # Pools can't be shared with forked processes (i.e. server workers),
+        # so every process lazily starts its own.
+        if self._pool is not None and self._pid == os.getpid():
+            return self._pool
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+                self._slots = threading.BoundedSemaphore(
+                    self.workers + self.queue_size)
+            return self._pool
+
+
+hasher = HashingExecutor()
+atexit.register(hasher.shutdown)
@@ -0,0 +1,149 @@
+"""
+    flaskngo.auth.login_stats
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Write-behind buffer for user login statistics.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+# Third-party imports
+from sqlalchemy import text
+# BITSON imports
+from app.extensions import db
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+UPDATE_SQL = """
+UPDATE auth_users SET
+    login_count = COALESCE(auth_users.login_count, 0) + v.count,
+    last_login_at = GREATEST(auth_users.last_login_at, v.last_login_at),
+    last_login_ip = CASE
+        WHEN auth_users.last_login_at IS NULL
+          OR v.last_login_at >= auth_users.last_login_at
+        THEN v.last_login_ip
+        ELSE auth_users.last_login_ip
+    END,
+    updated_on = :updated_on
+FROM (VALUES {values}) AS v(id, count, last_login_at, last_login_ip)
+WHERE auth_users.id = v.id
+"""
+
+
+class LoginStatsBuffer(object):
+    """Gathers login statistics in memory and flushes them in batches.
+
+    Logins of the same user are merged: counts are added and the latest
+    timestamp (with its IP) is kept. A background thread per process flushes
+    the buffer every `interval` seconds and once more at shutdown, so
+    `last_login_at` is eventually consistent.
+
+    :param interval: seconds between flushes.
+    :param batch_size: max users updated by a single statement.
+    """
+
+    def __init__(self, interval=5, batch_size=500):
+        self.enabled = False
+        self.interval = interval
+        self.batch_size = batch_size
+        self.app = None
+        self._pending = dict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('LOGIN_STATS_WRITE_BEHIND', False)
+        self.interval = app.config.get('LOGIN_STATS_FLUSH_INTERVAL',
+                                       self.interval)
+        self.batch_size = app.config.get('LOGIN_STATS_BATCH_SIZE',
+                                         self.batch_size)
+
+    def add(self, user_id, logged_at, ip):
+        with self._lock:
+            entry = self._pending.get(user_id)
+            if entry is None:
+                self._pending[user_id] = [1, logged_at, ip]
+            else:
+                entry[0] += 1
+                if logged_at >= entry[1]:
+                    entry[1], entry[2] = logged_at, ip
+        metrics.incr('login_stats.buffered')
+        self._ensure_thread()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, dict()
+        if not pending or self.app is None:
+            return
+        items = list(pending.items())
+        with self.app.app_context():
+            try:
+                for start in range(0, len(items), self.batch_size):
+                    self._update(items[start:start + self.batch_size])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Could not flush login statistics')
+                self._merge_back(pending)
+                return
+        metrics.incr('login_stats.flushed', len(items))
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    @staticmethod
+    def _update(items):
+        values = list()
+        params = dict(updated_on=datetime.utcnow())
+        for i, (user_id, (count, logged_at, ip)) in enumerate(items):
+            values.append('(:id_{0}, :count_{0}, :at_{0}, '
+                          'CAST(:ip_{0} AS INET))'.format(i))
+            params.update({'id_{}'.format(i): user_id,
+                           'count_{}'.format(i): count,
+                           'at_{}'.format(i): logged_at,
+                           'ip_{}'.format(i): ip})
+        query = text(UPDATE_SQL.format(values=', '.join(values)))
+        db.session.execute(query, params)
+
+    def _merge_back(self, pending):
+        with self._lock:
+            for user_id, (count, logged_at, ip) in pending.items():
+                entry = self._pending.get(user_id)
+                if entry is None:
+                    self._pending[user_id] = [count, logged_at, ip]
+                    continue
+                entry[0] += count
+                if logged_at > entry[1]:
+                    entry[1], entry[2] = logged_at, ip
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run,
+                                                name='login-stats',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+login_stats = LoginStatsBuffer()
+atexit.register(login_stats.stop)
@@ -10,15 +10,24 @@
 """
 # Standard lib imports
 from datetime import datetime
+from functools import partial
+from itertools import chain
 # Third-party imports
 from flask import g, current_app, request
-from itsdangerous import (TimedJSONWebSignatureSerializer as Serializer,
-                          BadSignature, SignatureExpired)
-from passlib.apps import custom_app_context as pwd_ctx
+from sqlalchemy import func, or_
 from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy.orm import Session
+from werkzeug.local import LocalProxy
 # BITSON imports
+from .cache import token_cache, rejected_tokens
+from .hashing import hasher
+from .login_stats import login_stats
+from .revocation import revocations
+from .tokens import tokens
 from app.errors import unauthorized
 from app.extensions import db, AppModel, httpauth
+from app.filters import Filter, boolean
+from app.metrics import metrics
 
 
 class Permission:
@@ -35,8 +44,14 @@ class RoleGroup(AppModel):
     name = db.Column(db.String(64), unique=True, index=True)
     roles = db.relationship('Role', back_populates='role_group')
 
-    def export_data(self, exclude=None):
-        response = super().export_data(exclude=exclude)
+    eager_loads = {'roles': 'subquery'}
+    filters = {'name': Filter('name')}
+    sorts = ('id', 'name')
+
+    def export_data(self, exclude=None, fields=None):
+        response = super().export_data(exclude=exclude, fields=fields)
+        if fields is not None and 'roles' not in fields:
+            return response
         roles = list()
         for role in self.roles:
             roles.append(role.export_data(exclude=exclude))
@@ -48,10 +63,18 @@ class Role(AppModel):
     __tablename__ = 'auth_roles'
 
     name = db.Column(db.String(64), unique=True, index=True)
-    role_group_id = db.Column(db.Integer, db.ForeignKey('auth_role_groups.id'))
+    role_group_id = db.Column(db.Integer, db.ForeignKey('auth_role_groups.id'),
+                              index=True)
 
     role_group = db.relationship('RoleGroup', back_populates='roles')
 
+    filters = {
+        'name': Filter('name'),
+        'role_group_id': Filter('role_group_id', convert=int),
+        'role_group': Filter('role_group', field='name'),
+    }
+    sorts = ('id', 'name')
+
     @classmethod
     def create_with_role_group_name(cls, name, description, role_group_name):
         role_group = RoleGroup.get_by(name=role_group_name)
@@ -61,24 +84,52 @@ class Role(AppModel):
         db.session.commit()
         return new_role
 
+    def revoke_users_tokens(self):
+        """Bumps the permissions version of every user with this role, so
+        tokens carrying the old role names are no longer accepted."""
+        user_ids = [user_id for user_id, in db.session.query(
+            UserRole.user_id).filter_by(role_id=self.id)]
+        if not user_ids:
+            return
+        User.query.filter(User.id.in_(user_ids)).update(
+            {User.permissions_version: User.permissions_version + 1,
+             User.updated_on: datetime.utcnow()},
+            synchronize_session=False)
+        db.session.info.setdefault('changed_user_ids', set()).update(user_ids)
+
 
 class User(AppModel):
     __tablename__ = 'auth_users'
+    __table_args__ = (
+        db.Index('ix_auth_users_last_login_at_id', 'last_login_at', 'id'),
+    )
 
     description = None
     username = db.Column(db.String(64), unique=True, index=True)
     password_hash = db.Column(db.String(128))
     email = db.Column(db.String(64), unique=True, index=True)
-    active = db.Column(db.Boolean, default=True)
-    confirmed = db.Column(db.Boolean, default=False)
+    active = db.Column(db.Boolean, default=True, index=True)
+    confirmed = db.Column(db.Boolean, default=False, index=True)
     confirmed_at = db.Column(db.DateTime())
     last_login_at = db.Column(db.DateTime())
     last_login_ip = db.Column(INET)
     login_count = db.Column(db.Integer, default=0)
+    permissions_version = db.Column(db.Integer, nullable=False, default=0,
+                                    server_default='0')
 
     roles = db.relationship('Role', secondary='auth_users_roles',
                             backref=db.backref('users', lazy='dynamic'))
 
+    eager_loads = {'roles': 'subquery'}
+    filters = {
+        'username': Filter('username'),
+        'email': Filter('email'),
+        'active': Filter('active', convert=boolean),
+        'confirmed': Filter('confirmed', convert=boolean),
+        'role': Filter('roles', field='name'),
+    }
+    sorts = ('id', 'username', 'email', 'last_login_at')
+
     @classmethod
     def create_with_role(cls, username, password, email, role, **kwargs):
         new_user = cls(username=username, password=password,
@@ -89,48 +140,125 @@ class User(AppModel):
         db.session.commit()
         return new_user
 
+    @classmethod
+    def get_by_email_or_username(cls, email=None, username=None):
+        """Loads a user by `email` or `username` in a single query, the
+        `email` match wins if both match different users."""
+        clauses = list()
+        if email:
+            clauses.append(cls.email == email)
+        if username:
+            clauses.append(cls.username == username)
+        if not clauses:
+            return None
+        query = cls.query.filter(or_(*clauses))
+        if len(clauses) > 1:
+            query = query.order_by((cls.email == email).desc())
+        return query.first()
+
     @property
     def password(self):
         raise AttributeError('password is not a readable attribute')
 
     @password.setter
     def password(self, password):
-        self.password_hash = pwd_ctx.encrypt(password)
+        self.password_hash = hasher.hash(password)
 
     def verify_password(self, password):
-        return pwd_ctx.verify(password, self.password_hash)
+        verified = hasher.verify(password, self.password_hash)
+        if verified and hasher.needs_update(self.password_hash):
+            hasher.rehash_async(password, partial(
+                self.store_rehash, current_app._get_current_object(),
+                self.id, self.password_hash))
+        return verified
+
+    @staticmethod
+    def store_rehash(app, user_id, old_hash, new_hash):
+        """Replaces an outdated hash, unless the password changed meanwhile."""
+        with app.app_context():
+            User.query.filter_by(id=user_id, password_hash=old_hash).update(
+                {User.password_hash: new_hash}, synchronize_session=False)
+            db.session.commit()
+
+    def generate_auth_token(self, expiration, with_roles=False):
+        """Signs a token for this user.
+
+        :param expiration: seconds until the token become invalid.
+        :param with_roles: embeds user role names, so :func:`roles_required`
+                           and :func:`roles_accepted` don't hit the DB.
+        """
+        data = {'id': self.id, 'pv': self.permissions_version or 0}
+        if with_roles:
+            data['roles'] = self.list_roles_names()
+        return tokens.dumps('auth', data, expires_in=expiration)
+
+    def generate_access_token(self, expiration=None):
+        """Signs a short-lived access token.
+
+        Access tokens are verified from their signature and claims alone, so
+        they are only issued to users allowed to authenticate.
+        """
+        data = {'id': self.id, 'pv': self.permissions_version or 0,
+                'roles': self.list_roles_names()}
+        return tokens.dumps('access', data, expires_in=expiration or
+                            current_app.config.get('ACCESS_TOKEN_TTL'))
+
+    def generate_refresh_token(self, expiration=None):
+        """Signs a refresh token, exchanged for new access tokens."""
+        data = {'id': self.id, 'pv': self.permissions_version or 0}
+        return tokens.dumps('refresh', data, expires_in=expiration or
+                            current_app.config.get('SESSION_TTL'))
+
+    @staticmethod
+    def verify_refresh_token(token):
+        """Checks a refresh token against the DB, returns its user or None."""
+        loaded = tokens.load(token, 'refresh')
+        if not loaded:
+            return None
+        data, _ = loaded
+        if revocations.is_revoked(data.get('jti')):
+            return None
+        user = User.query.get(data['id']) if data.get('id') else None
+        if not user or not user.can_authenticate():
+            return None
+        if data.get('pv', 0) != (user.permissions_version or 0):
+            return None  # revoked token
+        return user
+
+    def can_authenticate(self):
+        """Whether tokens of this user are accepted."""
+        if not self.active or self.erased:
+            return False
+        if current_app.config.get('AUTH_CONFIRM_EMAIL') and not self.confirmed:
+            return False
+        return True
 
-    def generate_auth_token(self, expiration):
-        s = Serializer(current_app.config.get('SECRET_KEY'),
-                       expires_in=int(expiration))
-        return s.dumps({'id': self.id})
+    @staticmethod
+    def load_auth_token(token):
+        """Returns a `(claims, header)` tuple for a valid token or `None`."""
+        return tokens.load(token, 'auth')
 
     @staticmethod
     def verify_auth_token(token):
-        s = Serializer(current_app.config.get('SECRET_KEY'))
-        try:
-            data = s.loads(token)
-        except SignatureExpired:
-            return None  # valid token, but expired
-        except BadSignature:
-            return None  # invalid token
+        loaded = User.load_auth_token(token)
+        if not loaded:
+            return None
+        data, _ = loaded
         user_id = data.get('id')
         if not user_id:
             return None
         return User.query.get(user_id)
 
     def generate_email_token(self, expiration):
-        s = Serializer(current_app.config.get('SECRET_KEY'),
-                       expires_in=int(expiration))
-        return s.dumps({'email': self.email})
+        return tokens.dumps('email', {'email': self.email},
+                            expires_in=expiration)
 
     @staticmethod
     def confirm(token):
-        s = Serializer(current_app.config.get('SECRET_KEY'))
-        try:
-            data = s.loads(token)
-        except (BadSignature, SignatureExpired):
+        loaded = tokens.load(token, 'email')
+        if not loaded:
             return False
+        data, _ = loaded
         user = db.session.query(User).filter_by(email=data.get('email')).first()
         if not user or user.confirmed:
             return False
@@ -141,29 +269,27 @@ class User(AppModel):
         return True
 
     def generate_reset_token(self, expiration=3600):
-        s = Serializer(current_app.config.get('SECRET_KEY'), int(expiration))
-        return s.dumps({'reset': self.id})
+        return tokens.dumps('reset', {'reset': self.id}, expires_in=expiration)
 
     @staticmethod
     def verify_reset_password_token(token):
-        s = Serializer(current_app.config.get('SECRET_KEY'))
-        try:
-            data = s.loads(token)
-        except (BadSignature, SignatureExpired):
+        loaded = tokens.load(token, 'reset')
+        if not loaded:
             return False
+        data, _ = loaded
         return db.session.query(User).filter_by(id=data.get('reset')).first()
 
     def generate_email_change_token(self, new_email, expiration=3600):
-        s = Serializer(current_app.config.get('SECRET_KEY'), int(expiration))
-        return s.dumps({'change_email': self.id, 'new_email': new_email})
+        return tokens.dumps('change_email', {'change_email': self.id,
+                                             'new_email': new_email},
+                            expires_in=expiration)
 
     @staticmethod
     def change_email(token):
-        s = Serializer(current_app.config.get('SECRET_KEY'))
-        try:
-            data = s.loads(token)
-        except (BadSignature, SignatureExpired):
+        loaded = tokens.load(token, 'change_email')
+        if not loaded:
             return False
+        data, _ = loaded
         user = db.session.query(User).filter_by(email=data.get(
             'new_email')).first()
         if not user or user.confirmed:
@@ -182,9 +308,36 @@ class User(AppModel):
         return self.can(Permission.ADMINISTER)
 
     def logged_in(self, commit=True):
-        self.last_login_at = datetime.now()
-        self.last_login_ip = request.remote_addr
-        self.login_count += 1
+        """Updates login statistics with a single atomic `UPDATE`, so
+        concurrent logins of the same user don't lose increments.
+
+        With `LOGIN_STATS_WRITE_BEHIND` the statistics are buffered and
+        written in background batches instead."""
+        if login_stats.enabled:
+            login_stats.add(self.id, datetime.now(), request.remote_addr)
+            return
+        User.query.filter_by(id=self.id).update({
+            User.last_login_at: datetime.now(),
+            User.last_login_ip: request.remote_addr,
+            User.login_count: func.coalesce(User.login_count, 0) + 1,
+            User.updated_on: datetime.utcnow(),
+        }, synchronize_session=False)
+        db.session.expire(self, ['last_login_at', 'last_login_ip',
+                                 'login_count', 'updated_on'])
+        if commit:
+            db.session.commit()
+
+    def auth_snapshot(self):
+        """Flags checked on every authenticated request."""
+        return {
+            'active': self.active,
+            'confirmed': self.confirmed,
+            'erased': self.erased,
+        }
+
+    def revoke_tokens(self, commit=True):
+        """Invalidates every token issued until now for this user."""
+        self.permissions_version = (self.permissions_version or 0) + 1
         if commit:
             db.session.commit()
 
@@ -195,6 +348,7 @@ class User(AppModel):
         new_role = Role.get_by(name=role_name)
         if new_role:
             self.roles.append(new_role)
+            self.revoke_tokens(commit=False)
             if commit:
                 db.session.commit()
             return True
@@ -209,12 +363,15 @@ class User(AppModel):
             if role.name == role_name:
                 self.roles.pop(i)
                 break
+        self.revoke_tokens(commit=False)
         if commit:
             db.session.commit()
         return True
 
-    def export_data(self, exclude=None):
-        response = super().export_data(exclude=exclude)
+    def export_data(self, exclude=None, fields=None):
+        response = super().export_data(exclude=exclude, fields=fields)
+        if fields is not None and 'roles' not in fields:
+            return response
         roles = list()
         for role in self.roles:
             roles.append(role.export_data(exclude=exclude))
@@ -261,8 +418,74 @@ class UserRole(AppModel):
     __tablename__ = 'auth_users_roles'
 
     description = None
+    user_id = db.Column(db.Integer, db.ForeignKey('auth_users.id'), index=True)
+    role_id = db.Column(db.Integer, db.ForeignKey('auth_roles.id'), index=True)
+
+
+class RevokedToken(db.Model):
+    """Token revoked before its expiration, see :mod:`.revocation`."""
+    __tablename__ = 'auth_revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(32), nullable=False, unique=True, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('auth_users.id'))
-    role_id = db.Column(db.Integer, db.ForeignKey('auth_roles.id'))
+    expires_at = db.Column(db.DateTime, index=True)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow,
+                           nullable=False, index=True)
+
+    @classmethod
+    def revoke(cls, claims, token_exp=None, commit=True):
+        """Revokes the token with the given (already verified) claims."""
+        expires_at = datetime.utcfromtimestamp(token_exp) if token_exp \
+            else None
+        revocations.revoke(claims.get('jti'), user_id=claims.get('id'),
+                           expires_at=expires_at, commit=commit)
+
+
+# User flags assumed for access tokens, only issued to users passing them.
+ACCESS_SNAPSHOT = {'active': True, 'confirmed': True, 'erased': False}
+
+
+def load_current_user(user_id):
+    """Loads the request user once, only when a view really needs it."""
+    user = getattr(g, '_current_user', None)
+    if user is None:
+        user = g._current_user = User.query.get(user_id)
+    return user
+
+
+def verify_token(token, digest):
+    """Verifies a not yet cached token and caches it.
+
+    Access tokens are trusted as issued, their user is only loaded if a view
+    needs it. Auth tokens are checked against the user row.
+
+    :returns: a `(cached_token, user)` tuple, `user` is `None` if not loaded.
+    """
+    loaded = tokens.load(token, 'access', 'auth')
+    if not loaded:
+        return None, None
+    claims, header = loaded
+    if not claims.get('id'):
+        return None, None
+    if header.get('pur') == 'access':
+        cached = token_cache.set(digest, user_id=claims['id'], claims=claims,
+                                 snapshot=ACCESS_SNAPSHOT,
+                                 roles=frozenset(claims.get('roles', ())),
+                                 token_exp=header.get('exp'))
+        return cached, None
+    user = User.query.get(claims['id'])
+    if not user:
+        return None, None
+    if claims.get('pv', 0) != (user.permissions_version or 0):
+        return None, None  # revoked token
+    roles = claims.get('roles')
+    cached = token_cache.set(digest, user_id=user.id, claims=claims,
+                             snapshot=user.auth_snapshot(),
+                             roles=frozenset(roles) if roles is not None
+                             else None,
+                             token_exp=header.get('exp'))
+    return cached, user
 
 
 @httpauth.verify_password
@@ -273,20 +496,63 @@ def verify_password(email_or_token=None, password=None):
         token = request.json.get(current_app.config.get('AUTH_TOKEN_KEY'))
     else:
         return False
-    g.current_user = User.verify_auth_token(token)
-    if not g.current_user:
+    digest = token_cache.digest(token)
+    if digest in rejected_tokens:
+        metrics.incr('auth.rejected_cached')
+        return False
+    cached, user = token_cache.get(digest), None
+    if cached is None:
+        cached, user = verify_token(token, digest)
+    if cached is None or revocations.is_revoked(cached.claims.get('jti')):
+        token_cache.discard(digest)
+        rejected_tokens.add(digest)
+        metrics.incr('auth.rejected')
         return False
-    if not g.current_user.active:
+    if user is not None:
+        g.current_user = user
+    else:
+        g.current_user = LocalProxy(partial(load_current_user, cached.user_id))
+    if not cached.snapshot['active']:
         return False
     if current_app.config.get('AUTH_CONFIRM_EMAIL') and not \
-            g.current_user.confirmed:
+            cached.snapshot['confirmed']:
         return False
-    if g.current_user.erased:
+    if cached.snapshot['erased']:
         return False
+    g.token_claims = cached.claims
+    g.token_digest = digest
+    g.token_exp = cached.token_exp
+    g.current_roles = cached.roles
     g.token_used = True
-    return g.current_user is not None
+    return True
 
 
 @httpauth.error_handler
 def auth_error():
-    return unauthorized('Invalid credentials')
+    # Rendered once per app, rejected requests are often repeated.
+    body = current_app.extensions.get('auth_error_body')
+    if body is None:
+        body = unauthorized('Invalid credentials').get_data()
+        current_app.extensions['auth_error_body'] = body
+    return current_app.response_class(body, status=401,
+                                      mimetype='application/json')
+
+
+@db.event.listens_for(Session, 'after_flush')
+def collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_user_ids', set())
+    for instance in chain(session.dirty, session.deleted):
+        if isinstance(instance, User) and instance.id is not None:
+            changed.add(instance.id)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def evict_changed_users(session):
+    changed = session.info.pop('changed_user_ids', None)
+    if changed:
+        token_cache.evict_users(changed)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
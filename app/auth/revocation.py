@@ -0,0 +1,176 @@
+"""
+    flaskngo.auth.revocation
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Token revocation list mirrored into a per-process Bloom filter.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+# Third-party imports
+# BITSON imports
+from app.extensions import db
+from app.metrics import metrics
+
+
+class BloomFilter(object):
+    """Set membership with no false negatives and a bounded false positive
+    rate, `error_rate`, while holding up to `capacity` items.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = int(math.ceil(-capacity * math.log(error_rate) /
+                                  math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+
+class RevocationList(object):
+    """Revoked token ids (`jti` claim), stored in `auth_revoked_tokens`.
+
+    Every process mirrors the table in a Bloom filter, refreshed with the
+    rows added since the last refresh at most every `refresh_interval`
+    seconds, and rebuilt from the not yet expired rows when full. Most tokens
+    are cleared by a single filter lookup, only possible hits query the table.
+    Revocations from other processes apply after the next refresh.
+
+    Ids are not committed in order, so every refresh also re-reads the rows
+    created within `refresh_slack` seconds of the newest one seen: a row
+    committed after a refresh that already saw a greater id is still found.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001, refresh_interval=10,
+                 refresh_slack=60):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.refresh_slack = timedelta(seconds=refresh_slack)
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.last_id = 0
+        self.last_created = None
+        self.last_refresh = 0
+        self._recent = dict()  # id: created_on, of the rows in the slack
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.capacity = app.config.get('REVOCATION_CAPACITY', self.capacity)
+        self.error_rate = app.config.get('REVOCATION_ERROR_RATE',
+                                         self.error_rate)
+        self.refresh_interval = app.config.get('REVOCATION_REFRESH_INTERVAL',
+                                               self.refresh_interval)
+        self.refresh_slack = timedelta(seconds=app.config.get(
+            'REVOCATION_REFRESH_SLACK', self.refresh_slack.total_seconds()))
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            self.last_id = 0
+            self.last_created = None
+            self.last_refresh = 0
+            self._recent = dict()
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        if time.monotonic() - self.last_refresh >= self.refresh_interval:
+            self.refresh()
+        if jti not in self.bloom:
+            metrics.incr('revocation.cleared')
+            return False
+        from .models import RevokedToken
+        metrics.incr('revocation.lookups')
+        return db.session.query(RevokedToken.id).filter_by(
+            jti=jti).first() is not None
+
+    def revoke(self, jti, user_id=None, expires_at=None, commit=True):
+        from .models import RevokedToken
+        if not jti:
+            return
+        db.session.add(RevokedToken(jti=jti, user_id=user_id,
+                                    expires_at=expires_at))
+        if commit:
+            db.session.commit()
+        with self._lock:
+            self.bloom.add(jti)
+
+    def refresh(self):
+        """Adds revocations made since the last refresh to the filter."""
+        from .models import RevokedToken
+        with self._lock:
+            self.last_refresh = time.monotonic()
+            last_id, last_created = self.last_id, self.last_created
+        condition = RevokedToken.id > last_id
+        if last_created is not None:
+            condition = db.or_(condition, RevokedToken.created_on >=
+                               last_created - self.refresh_slack)
+        rows = db.session.query(RevokedToken.id, RevokedToken.jti,
+                                RevokedToken.created_on).filter(
+            condition).order_by(RevokedToken.id).all()
+        with self._lock:
+            rows = [row for row in rows if row[0] not in self._recent]
+            if not rows:
+                return
+            if self.bloom.count + len(rows) > self.bloom.capacity:
+                self._rebuild()
+                return
+            for _, jti, _ in rows:
+                self.bloom.add(jti)
+            self._seen(rows)
+
+    def _seen(self, rows):
+        """Moves the refresh marks past `rows`, already in the filter."""
+        self.last_id = max([self.last_id] + [row[0] for row in rows])
+        self.last_created = max([row[2] for row in rows] +
+                                [self.last_created or datetime.min])
+        self._recent.update((row[0], row[2]) for row in rows)
+        since = self.last_created - self.refresh_slack
+        self._recent = dict((row_id, created_on) for row_id, created_on
+                            in self._recent.items() if created_on >= since)
+
+    def _rebuild(self):
+        """Rebuilds the filter from the live rows, with room for as many
+        again (and at least `capacity`), so it doesn't fill up at once."""
+        from .models import RevokedToken
+        rows = db.session.query(RevokedToken.id, RevokedToken.jti,
+                                RevokedToken.created_on).filter(
+            db.or_(RevokedToken.expires_at.is_(None),
+                   RevokedToken.expires_at >= datetime.utcnow())).all()
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)),
+                            self.error_rate)
+        for _, jti, _ in rows:
+            bloom.add(jti)
+        self.bloom = bloom
+        self._recent = dict()
+        if rows:
+            self._seen(rows)
+        metrics.incr('revocation.rebuilds')
+
+
+revocations = RevocationList()
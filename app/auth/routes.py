@@ -10,13 +10,25 @@
 """
 # Standard lib imports
 # Third-party imports
-from flask import Blueprint, request, jsonify, url_for, g, current_app
+from flask import (Blueprint, request, url_for, g, current_app, make_response,
+                   stream_with_context)
 from sqlalchemy.exc import IntegrityError
 # BITSON imports
-from .decorators import roles_accepted, roles_required
-from .models import User, Role, RoleGroup
-from app.errors import unauthorized, bad_request, not_found
+from .decorators import current_roles, roles_accepted, roles_required
+from .cache import token_cache
+from .hashing import HashingUnavailable
+from .models import User, Role, RoleGroup, UserRole, RevokedToken
+from .tokens import tokens
+from app.conditional import (is_not_modified, not_modified, set_validators,
+                             validators)
+from app.errors import (unauthorized, bad_request, not_found,
+                        service_unavailable)
 from app.extensions import db, httpauth
+from app.filters import FilterError, apply_filters, flag, parse_sort
+from app.json_backend import dumps, jsonify
+from app.pagination import PaginationError, decode_cursor, page_size, paginate
+from app.response_cache import response_cache
+from app.serializers import FieldsError, parse_fields
 from app.email import celery_email
 
 
@@ -24,6 +36,18 @@ auth = Blueprint('auth', __name__, template_folder='templates/',
                  url_prefix='/auth')
 
 
+@auth.errorhandler(HashingUnavailable)
+def hashing_unavailable(error):
+    return service_unavailable('Too many requests, please try again later')
+
+
+@auth.errorhandler(PaginationError)
+@auth.errorhandler(FieldsError)
+@auth.errorhandler(FilterError)
+def query_error(error):
+    return bad_request(str(error))
+
+
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
     """ View function which handles logged_in.
@@ -32,6 +56,9 @@ def login():
         Using HTTP POST will handle logged_in request. First will try to
         load user using `email` provided, then the `username`.
 
+        Returns a short-lived access `token` and a `refresh_token` to get new
+        access tokens from :func:`refresh`.
+
         :param email: user email.
         :param password: user password.
         :param username: registered username.
@@ -55,25 +82,76 @@ def login():
         if not password and (not username or not email):
             return bad_request('Please send your credentials to logged_in')
 
-        user = User.query.filter_by(email=email).first()
-        if not user:
-            user = User.query.filter_by(username=username).first()
-        if user and user.verify_password(password):
+        user = User.get_by_email_or_username(email=email, username=username)
+        if user and user.verify_password(password) and \
+                user.can_authenticate():
             user.logged_in()
             g.current_user = user
         else:
             return unauthorized('Invalid credentials')
 
-        token = user.generate_auth_token(current_app.config.get('SESSION_TTL'))
+        token = user.generate_access_token()
+        refresh_token = user.generate_refresh_token()
         response = {
             'data': {
                 'token': token.decode('utf-8'),
-                'expiration': current_app.config.get('SESSION_TTL'),
+                'expiration': current_app.config.get('ACCESS_TOKEN_TTL'),
+                'refresh_token': refresh_token.decode('utf-8'),
+                'refresh_expiration': current_app.config.get('SESSION_TTL'),
             }
         }
         return jsonify(response)
 
 
+@auth.route('/refresh', methods=['POST'])
+def refresh():
+    """ View function which exchanges a refresh token for a new access
+    token. This is the only place where refresh tokens hit the DB.
+
+    :param refresh_token: token given by :func:`login`.
+    :return: a JSON with the new access `token` & `expiration` value.
+    """
+    refresh_token = (request.get_json() or {}).get('refresh_token')
+    if not refresh_token:
+        return bad_request('Please send your refresh token')
+    user = User.verify_refresh_token(refresh_token)
+    if not user:
+        return unauthorized('Invalid credentials')
+    token = user.generate_access_token()
+    response = {
+        'data': {
+            'token': token.decode('utf-8'),
+            'expiration': current_app.config.get('ACCESS_TOKEN_TTL'),
+        }
+    }
+    return jsonify(response)
+
+
+@auth.route('/logout', methods=['POST'])
+@httpauth.login_required
+def logout():
+    """ View function which revokes the token used in this request and,
+    if given, the `refresh_token` of the same user.
+
+    :param refresh_token: token given by :func:`login`.
+    :return: a JSON with a `message`.
+    """
+    RevokedToken.revoke(g.token_claims, token_exp=g.token_exp, commit=False)
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    loaded = tokens.load(refresh_token, 'refresh') if refresh_token else None
+    if loaded and loaded[0].get('id') == g.token_claims.get('id'):
+        RevokedToken.revoke(loaded[0], token_exp=loaded[1].get('exp'),
+                            commit=False)
+    db.session.commit()
+    token_cache.discard(g.token_digest)
+    response = {
+        'data': {
+            'message': 'You have successfully logged out!'
+        }
+    }
+    return jsonify(response)
+
+
 @auth.route('/register', methods=['POST'])
 @roles_required('root')
 def register():
@@ -105,7 +183,9 @@ def register():
         db.session.rollback()
         return bad_request('Please use another username/email')
     expiration = current_app.config.get('SESSION_TTL')
-    token = user.generate_auth_token(expiration=expiration)
+    token = user.generate_auth_token(
+        expiration=expiration,
+        with_roles=current_app.config.get('AUTH_TOKEN_EMBED_ROLES'))
     email_token = user.generate_email_token(expiration=expiration*5)
     celery_email(subject='Confirm Your Account', recipients=[user.email, ],
                  countdown=5, template='confirm_account',
@@ -129,17 +209,23 @@ def register():
 @auth.route('/token')
 @httpauth.login_required
 def get_token():
-    """ View function which returns a valid token for the user.
+    """ View function which returns a new access token for the user.
+
+    Access tokens are trusted from their claims alone, so the user is checked
+    against the DB before issuing another one: otherwise a deactivated user,
+    or one whose tokens were revoked, could renew them forever.
 
     :return: a JSON with user `token` & `expiration` value.
     """
-    token = g.current_user.generate_auth_token(
-        current_app.config.get('SESSION_TTL')
-    )
+    user = g.current_user
+    if not user or not user.can_authenticate() or \
+            g.token_claims.get('pv', 0) != (user.permissions_version or 0):
+        return unauthorized('Invalid credentials')
+    token = user.generate_access_token()
     response = {
         'data': {
             'token': token.decode('utf-8'),
-            'expiration': current_app.config.get('SESSION_TTL'),
+            'expiration': current_app.config.get('ACCESS_TOKEN_TTL'),
         }
     }
     return jsonify(response)
@@ -330,7 +416,8 @@ def reset_password(token):
         return bad_request('Invalid token')
 
     token = g.current_user.generate_auth_token(
-        current_app.config.get('SESSION_TTL'))
+        current_app.config.get('SESSION_TTL'),
+        with_roles=current_app.config.get('AUTH_TOKEN_EMBED_ROLES'))
     response = {
         'data': {
             'token': token.decode('utf-8'),
@@ -358,40 +445,141 @@ def change_password():
     return jsonify(response)
 
 
+def filter_auth_table(table, erased=False):
+    """ Query of the `table` rows selected by the query string filters."""
+    query = db.session.query(table).filter_by(erased=erased)
+    return apply_filters(query, table, request.args)
+
+
+def query_auth_table(table, exclude=None, erased=False):
+    """ Builds the query of a collection endpoint from the query string.
+
+    :returns: a `(query, fields, sort)` tuple.
+    """
+    fields = parse_fields(table, request.args.get('fields'), exclude=exclude)
+    sort = parse_sort(table, request.args.get('sort'))
+    loaded = fields if fields is None or sort is None else fields | {sort.name}
+    query = filter_auth_table(table, erased=erased).options(
+        *table.loader_options(fields=loaded))
+    return query, fields, sort
+
+
+def auth_table_response(table, exclude=None, erased=False):
+    """ Collection endpoint response, or `304 Not Modified` (checked with a
+    single aggregate query) if the client copy is still fresh.
+    """
+    stream = flag(request.args, 'stream')
+    etag, last_modified = validators(filter_auth_table(table, erased=erased),
+                                     table)
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+    if stream:
+        response = stream_auth_table(table, exclude=exclude, erased=erased)
+    else:
+        response = jsonify(get_auth_table(table, exclude=exclude,
+                                          erased=erased))
+    return set_validators(response, etag, last_modified)
+
+
 def get_auth_table(table, exclude=None, erased=False):
+    """ Lists a page of `table` rows, ordered by `sort` and `id`.
+
+    :param limit: page size, capped by the model `max_results_per_page`.
+    :param cursor: opaque value from the `next` URL of the previous page.
+    :param fields: comma separated columns (and relationships) to return.
+    :param sort: one of the model `sorts`, prefixed by `-` for descending.
+    :param <filter>: any of the model `filters`, e.g. `?active=true`.
+    """
     route = '.get_{}'.format(table.__tablename__.replace('auth_', ''))
+    limit = page_size(table, request.args.get('limit'))
+    cursor = decode_cursor(request.args.get('cursor'))
+    query, fields, sort = query_auth_table(table, exclude=exclude,
+                                           erased=erased)
+    results, next_cursor = paginate(query, table, limit, cursor, sort=sort)
+    next_args = dict(request.args.items(), limit=limit, cursor=next_cursor)
     response = {
         'url': url_for(route, _external=True),
-        'data': list()
+        'data': list(),
+        'next': url_for(route, _external=True, **next_args)
+        if next_cursor else None,
     }
-    results = db.session.query(table).filter_by(erased=erased).all()
     for result in results:
-        response['data'].append(result.export_data(exclude=exclude))
+        response['data'].append(result.export_data(exclude=exclude,
+                                                   fields=fields))
     return response
 
 
+def stream_auth_table(table, exclude=None, erased=False):
+    """ Streams every `table` row (after `cursor`, if given) as a JSON array,
+    fetched in keyset batches of `STREAM_BATCH_SIZE` rows, so memory use
+    doesn't grow with the table.
+    """
+    route = '.get_{}'.format(table.__tablename__.replace('auth_', ''))
+    batch_size = current_app.config.get('STREAM_BATCH_SIZE')
+    cursor = decode_cursor(request.args.get('cursor'))
+    query, fields, sort = query_auth_table(table, exclude=exclude,
+                                           erased=erased)
+
+    def generate(cursor=cursor):
+        yield b'{"url": ' + dumps(url_for(route, _external=True)) + \
+            b', "next": null, "data": ['
+        separator = b'\n'
+        while True:
+            results, next_cursor = paginate(query, table, batch_size, cursor,
+                                            sort=sort)
+            for result in results:
+                yield separator + dumps(
+                    result.export_data(exclude=exclude, fields=fields))
+                separator = b',\n'
+            if not next_cursor:
+                break
+            cursor = decode_cursor(next_cursor)
+        yield b'\n]}'
+
+    return current_app.response_class(stream_with_context(generate()),
+                                      mimetype='application/json')
+
+
 def get_item(table, endpoint, item_id, exclude=None, erased=False):
-    item = table.get_by(id=item_id, erased=erased)
+    fields = parse_fields(table, request.args.get('fields'), exclude=exclude)
+    query = db.session.query(table).filter_by(id=item_id, erased=erased)
+    item = query.options(*table.loader_options(fields=fields)).first()
     response = {
         'code': 200 if item else 404,
         'url': url_for(endpoint, item_id=item_id, _external=True),
-        'data': item.export_data(exclude=exclude) if item else 'item not found'
+        'data': item.export_data(exclude=exclude, fields=fields) if item
+        else 'item not found'
     }
     return response
 
 
+def auth_item_response(table, endpoint, item_id, exclude=None, erased=False):
+    """ Detail endpoint response, or `304 Not Modified` if the client copy
+    is still fresh.
+    """
+    query = db.session.query(table).filter_by(id=item_id, erased=erased)
+    etag, last_modified = validators(query, table)
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+    response = get_item(table, endpoint, item_id, exclude=exclude,
+                        erased=erased)
+    return set_validators(make_response(jsonify(response), response['code']),
+                          etag, last_modified)
+
+
 @auth.route('/role_groups/', methods=['GET'])
 @httpauth.login_required
+@response_cache.cached(Role, RoleGroup, UserRole, vary=current_roles)
 def get_role_groups():
-    return jsonify(get_auth_table(table=RoleGroup))
+    return auth_table_response(table=RoleGroup)
 
 
 @auth.route('/role_groups/<int:item_id>', methods=['GET'])
 @httpauth.login_required
+@response_cache.cached(Role, RoleGroup, UserRole, vary=current_roles)
 def get_role_group(item_id):
-    response = get_item(table=RoleGroup, endpoint='.get_role_group',
-                        item_id=item_id)
-    return jsonify(response), response['code']
+    return auth_item_response(table=RoleGroup, endpoint='.get_role_group',
+                              item_id=item_id)
 
 
 @auth.route('/role_groups/', methods=['POST'])
@@ -466,15 +654,17 @@ def delete_role_group(item_id):
 
 @auth.route('/roles/', methods=['GET'])
 @httpauth.login_required
+@response_cache.cached(Role, RoleGroup, UserRole, vary=current_roles)
 def get_roles():
-    return jsonify(get_auth_table(table=Role))
+    return auth_table_response(table=Role)
 
 
 @auth.route('/roles/<int:item_id>', methods=['GET'])
 @httpauth.login_required
+@response_cache.cached(Role, RoleGroup, UserRole, vary=current_roles)
 def get_role(item_id):
-    response = get_item(table=Role, endpoint='.get_role', item_id=item_id)
-    return jsonify(response), response['code']
+    return auth_item_response(table=Role, endpoint='.get_role',
+                              item_id=item_id)
 
 
 @auth.route('/roles/', methods=['POST'])
@@ -541,6 +731,8 @@ def edit_role(item_id):
     if Role.get_by(name=new_name):
         return bad_request('Already in DB')
 
+    if role.name != new_name:
+        role.revoke_users_tokens()
     role.name = new_name
     role.description = new_description
     role.role_group = role_group
@@ -561,6 +753,7 @@ def delete_role(item_id):
     role = Role.get_by(id=item_id)
     if not role:
         return not_found('item not found')
+    role.revoke_users_tokens()
     role.set_erased()
     response = {
         'data': {
@@ -575,15 +768,14 @@ def delete_role(item_id):
 @auth.route('/users/', methods=['GET'])
 @httpauth.login_required
 def get_users():
-    return jsonify(get_auth_table(table=User, exclude=['password_hash']))
+    return auth_table_response(table=User, exclude=['password_hash'])
 
 
 @auth.route('/users/<int:item_id>', methods=['GET'])
 @roles_required('root')
 def get_user(item_id):
-    return jsonify(get_item(table=User, item_id=item_id, endpoint='.get_user',
-                            exclude=['password_hash'])
-                   )
+    return auth_item_response(table=User, endpoint='.get_user',
+                              item_id=item_id, exclude=['password_hash'])
 
 
 @auth.route('/users/', methods=['POST'])
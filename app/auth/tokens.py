@@ -0,0 +1,154 @@
+"""
+    flaskngo.auth.tokens
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Token service: signs and verifies every token type with cached signers.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import hashlib
+import json
+import threading
+import uuid
+# Third-party imports
+from itsdangerous import (TimedJSONWebSignatureSerializer,
+                          JSONWebSignatureSerializer, Signer, BadHeader,
+                          BadSignature, SignatureExpired, base64_decode,
+                          want_bytes)
+# BITSON imports
+
+#: Known token purposes, each one signs with its own salt so a token issued
+#: for one purpose is never accepted for another.
+PURPOSES = ('auth', 'access', 'refresh', 'email', 'reset', 'change_email')
+
+
+class _Signer(Signer):
+    """Signer deriving its key once instead of on every signature."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._key = Signer.derive_key(self)
+
+    def derive_key(self):
+        return self._key
+
+
+class _Serializer(TimedJSONWebSignatureSerializer):
+    """Timed JWS serializer reusing one signer and taking the expiration per
+    token (as an `expires_in` header field) instead of per instance."""
+
+    default_signer = _Signer
+
+    def __init__(self, secret_key, **kwargs):
+        super().__init__(secret_key, **kwargs)
+        self._signer = super().make_signer(self.salt, self.algorithm)
+
+    def make_signer(self, salt=None, algorithm=None):
+        if (salt is None or salt == self.salt) and \
+                (algorithm is None or algorithm is self.algorithm):
+            return self._signer
+        return super().make_signer(salt, algorithm)
+
+    def make_header(self, header_fields):
+        header_fields = dict(header_fields or {})
+        expires_in = header_fields.pop('expires_in', self.expires_in)
+        header = JSONWebSignatureSerializer.make_header(self, header_fields)
+        header['iat'] = self.now()
+        header['exp'] = header['iat'] + int(expires_in)
+        return header
+
+
+def key_id(secret_key):
+    """Short public fingerprint of a secret key."""
+    return hashlib.sha256(want_bytes(secret_key)).hexdigest()[:8]
+
+
+def peek_header(token):
+    """Returns the token header *without* verifying the signature."""
+    try:
+        header = json.loads(base64_decode(want_bytes(token).split(b'.', 1)[0])
+                            .decode('utf-8'))
+    except Exception:
+        raise BadHeader('Malformed token header')
+    if not isinstance(header, dict):
+        raise BadHeader('Malformed token header')
+    return header
+
+
+class TokenService(object):
+    """Signs and verifies tokens for every purpose.
+
+    Serializers (and their signers & derived keys) are built once per purpose
+    and key. Several keys may be active at once: the first one signs new
+    tokens, the others still verify tokens signed before a rotation. Tokens
+    carry the key id (`kid`) and purpose (`pur`) in their header.
+    """
+
+    def __init__(self):
+        self.salt_prefix = 'flaskngo'
+        self.keys = dict()
+        self.signing_kid = None
+        self._serializers = dict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        keys = app.config.get('SECRET_KEYS') or [app.config.get('SECRET_KEY')]
+        self.salt_prefix = app.config.get('PROJECT_NAME') or self.salt_prefix
+        self.keys = dict((key_id(key), key) for key in keys)
+        self.signing_kid = key_id(keys[0])
+        with self._lock:
+            self._serializers.clear()
+
+    def dumps(self, purpose, obj, expires_in):
+        """Signs `obj` as a `purpose` token valid for `expires_in` seconds.
+
+        Dict payloads get a unique token id (`jti`), used to revoke it.
+        """
+        if isinstance(obj, dict) and 'jti' not in obj:
+            obj = dict(obj, jti=uuid.uuid4().hex)
+        serializer = self._get_serializer(purpose, self.signing_kid)
+        return serializer.dumps(obj, header_fields={
+            'kid': self.signing_kid,
+            'pur': purpose,
+            'expires_in': expires_in,
+        })
+
+    def loads(self, token, *purposes):
+        """Verifies a token of any of the given `purposes`.
+
+        :returns: a `(payload, header)` tuple.
+        :raises: :class:`BadSignature` or :class:`SignatureExpired`.
+        """
+        header = peek_header(token)
+        purpose = header.get('pur')
+        kid = header.get('kid')
+        if purpose not in purposes or kid not in self.keys:
+            raise BadSignature('Unknown token purpose or key')
+        serializer = self._get_serializer(purpose, kid)
+        return serializer.loads(token, return_header=True)
+
+    def load(self, token, *purposes):
+        """Like :meth:`loads` but returns `None` for invalid tokens."""
+        try:
+            return self.loads(token, *purposes)
+        except SignatureExpired:
+            return None  # valid token, but expired
+        except BadSignature:
+            return None  # invalid token
+
+    def _get_serializer(self, purpose, kid):
+        serializer = self._serializers.get((purpose, kid))
+        if serializer is None:
+            if purpose not in PURPOSES:
+                raise ValueError('Unknown token purpose {}'.format(purpose))
+            salt = '{}.{}'.format(self.salt_prefix, purpose)
+            serializer = _Serializer(self.keys[kid], salt=salt)
+            with self._lock:
+                self._serializers[(purpose, kid)] = serializer
+        return serializer
+
+
+tokens = TokenService()
@@ -20,9 +20,19 @@ from flask import Flask
 # from flask_restless import APIManager
 # BITSON imports
 from .auth import auth as auth_blueprint
+from .auth.cache import token_cache, rejected_tokens
+from .auth.hashing import hasher
+from .auth.login_stats import login_stats
+from .auth.revocation import revocations
+from .auth.tokens import tokens
+from .compression import compression
+from .json_backend import json_backend
 from .main import main as main_blueprint
+from .response_cache import response_cache
 # FIXME: include EventLog into restless to log modifications.
 from .event_logs.models import EventLog  # needed to include in migrations.
+from .event_logs.policies import logging_policies
+from .event_logs.writer import event_log_writer
 from .errors import CUSTOM_ERRORS, CustomErrors, add_method
 from .extensions import celery, cors, db, mail, migrate
 from .helpers import register_apis, register_blueprints, create_folders
@@ -70,8 +80,18 @@ def create_app(config_name):
     fh.setFormatter(formatter)
     app.logger.addHandler(fh)
 
+    json_backend.init_app(app)
     db.init_app(app)
     mail.init_app(app)
+    token_cache.init_app(app)
+    rejected_tokens.init_app(app)
+    hasher.init_app(app)
+    login_stats.init_app(app)
+    tokens.init_app(app)
+    revocations.init_app(app)
+    response_cache.init_app(app)
+    event_log_writer.init_app(app)
+    compression.init_app(app)
     # login_manager.session_protection = 'strong'
     # login_manager.login_view = 'auth.logged_in'
     # login_manager.init_app(app)
@@ -81,6 +101,7 @@ def create_app(config_name):
         # manager = APIManager(flask_sqlalchemy_db=db)
 
         register_blueprints(app=app, blueprints=BLUEPRINTS)
+        logging_policies.init_app(app)
         # register_apis(apimanager=manager, apis=MODELS, url_prefix=URL_PREFIX)
 
         # manager.init_app(app)
@@ -0,0 +1,290 @@
+"""
+    flaskngo.compression
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    WSGI response compression (gzip, brotli when installed) and serving of
+    pre-compressed static files.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import gzip
+import io
+import mimetypes
+import os
+# Third-party imports
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.security import safe_join
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+# BITSON imports
+
+#: Pre-compressed sibling suffix of every encoding.
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+COMPRESSIBLE_MIMETYPES = (
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+    'text/xml',
+)
+
+
+def gzip_compress(data, level=6):
+    """Reproducible gzip (no timestamp in the header)."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=level,
+                       mtime=0) as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+def brotli_compress(data, quality=4):
+    return brotli.compress(data, quality=quality)
+
+
+def available_encodings():
+    """Supported encodings, preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip', )
+
+
+def negotiate(accept_encoding, encodings=None):
+    """Best of `encodings` the client accepts, `None` for identity."""
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    if encodings is None:
+        encodings = available_encodings()
+    for encoding in encodings:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def add_vary(headers, value='Accept-Encoding'):
+    values = [item.strip() for item in headers.get('Vary', '').split(',')
+              if item.strip()]
+    if '*' in values or value.lower() in [item.lower() for item in values]:
+        return
+    headers['Vary'] = ', '.join(values + [value])
+
+
+class CompressionMiddleware(object):
+    """Compresses responses of `wsgi_app` for clients accepting it.
+
+    Only responses with a compressible mimetype, a `Content-Length` of at
+    least `min_size` bytes and no `Content-Encoding` are compressed, so
+    streamed responses keep streaming. All of them get `Vary:
+    Accept-Encoding`, since the response depends on it.
+
+    Requests for a file in `static_folder` with an up to date `.br`/`.gz`
+    sibling (see :func:`compress_static`) are served that sibling instead.
+    """
+
+    def __init__(self, wsgi_app, min_size=500, level=6, brotli_quality=4,
+                 mimetypes=COMPRESSIBLE_MIMETYPES, static_folder=None,
+                 static_url_path=''):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+        self.static_folder = static_folder
+        self.static_url_path = static_url_path
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is not None and \
+                environ.get('REQUEST_METHOD') in ('GET', 'HEAD'):
+            static = self._precompressed(environ)
+            if static is not None:
+                return self._serve_precompressed(environ, start_response,
+                                                 *static)
+
+        response = dict()
+        body = list()
+
+        def capture(status, headers, exc_info=None):
+            response.update(status=status, headers=Headers(headers),
+                            exc_info=exc_info)
+            return body.append
+
+        app_iter = self.wsgi_app(environ, capture)
+        status, headers = response['status'], response['headers']
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip()
+        if mimetype not in self.mimetypes:
+            start_response(status, headers.to_wsgi_list(),
+                           response['exc_info'])
+            return self._chain(body, app_iter)
+        add_vary(headers)
+        if encoding is None or not self._should_compress(environ, status,
+                                                         headers):
+            start_response(status, headers.to_wsgi_list(),
+                           response['exc_info'])
+            return self._chain(body, app_iter)
+
+        try:
+            data = b''.join(body) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        data = self.compress(data, encoding)
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(len(data))
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # Not byte for byte the same representation anymore.
+            headers['ETag'] = 'W/' + etag
+        start_response(status, headers.to_wsgi_list(), response['exc_info'])
+        return [data]
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli_compress(data, self.brotli_quality)
+        return gzip_compress(data, self.level)
+
+    def _should_compress(self, environ, status, headers):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or \
+                status[:3] in ('204', '206', '304') or \
+                'Content-Encoding' in headers or \
+                'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        try:
+            return int(headers.get('Content-Length')) >= self.min_size
+        except (TypeError, ValueError):  # streamed
+            return False
+
+    @staticmethod
+    def _chain(body, app_iter):
+        if not body:
+            return app_iter
+        return _ClosingIterator(body, app_iter)
+
+    def _precompressed(self, environ):
+        """`(path, encoding, mimetype)` of the best up to date sibling of the
+        requested static file the client accepts, if any."""
+        if self.static_folder is None:
+            return None
+        path = environ.get('PATH_INFO', '')
+        prefix = self.static_url_path.rstrip('/') + '/'
+        if not path.startswith(prefix):
+            return None
+        filename = safe_join(self.static_folder, path[len(prefix):])
+        if filename is None or filename.endswith(tuple(SUFFIXES.values())) \
+                or not os.path.isfile(filename):
+            return None
+        modified = os.path.getmtime(filename)
+        encodings = [encoding for encoding in ('br', 'gzip')
+                     if os.path.isfile(filename + SUFFIXES[encoding]) and
+                     os.path.getmtime(filename + SUFFIXES[encoding]) >=
+                     modified]
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'), encodings)
+        if encoding is None:
+            return None
+        mimetype = mimetypes.guess_type(filename)[0] or \
+            'application/octet-stream'
+        return path + SUFFIXES[encoding], encoding, mimetype
+
+    def _serve_precompressed(self, environ, start_response, path, encoding,
+                             mimetype):
+        def precompressed_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            headers['Content-Type'] = mimetype
+            if status[:3] == '200':
+                headers['Content-Encoding'] = encoding
+            add_vary(headers)
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        return self.wsgi_app(dict(environ, PATH_INFO=path),
+                             precompressed_start_response)
+
+
+class _ClosingIterator(object):
+    """Yields what was written before `app_iter`, then `app_iter` itself."""
+
+    def __init__(self, written, app_iter):
+        self.written = written
+        self.app_iter = app_iter
+
+    def __iter__(self):
+        for data in self.written:
+            yield data
+        for data in self.app_iter:
+            yield data
+
+    def close(self):
+        if hasattr(self.app_iter, 'close'):
+            self.app_iter.close()
+
+
+class Compression(object):
+    """Wraps the app `wsgi_app` with :class:`CompressionMiddleware`."""
+
+    def init_app(self, app):
+        if not app.config.get('COMPRESSION_ENABLED', True):
+            return
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_size=app.config.get('COMPRESSION_MIN_SIZE', 500),
+            level=app.config.get('COMPRESSION_LEVEL', 6),
+            brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', 4),
+            mimetypes=app.config.get('COMPRESSION_MIMETYPES',
+                                     COMPRESSIBLE_MIMETYPES),
+            static_folder=app.static_folder,
+            static_url_path=app.static_url_path or '')
+
+
+compression = Compression()
+
+
+def compress_static(folder, exclude=(), min_size=500):
+    """Writes best compression `.gz` (and `.br` when brotli is installed)
+    siblings of every file in `folder` at least `min_size` bytes big.
+
+    Siblings not smaller than the original (i.e. of PNGs) are not kept.
+
+    :returns: a list of `(path, original size, {encoding: size})` tuples.
+    """
+    compressors = [('gzip', lambda data: gzip_compress(data, 9))]
+    if brotli is not None:
+        compressors.insert(0, ('br', lambda data: brotli_compress(data, 11)))
+    excluded = [os.path.abspath(path) for path in exclude]
+    suffixes = tuple(SUFFIXES.values())
+    results = list()
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [name for name in dirs
+                   if os.path.abspath(os.path.join(root, name))
+                   not in excluded]
+        for name in sorted(files):
+            if name.endswith(suffixes):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            sizes = dict()
+            for encoding, compress in compressors:
+                sibling = path + SUFFIXES[encoding]
+                compressed = compress(data)
+                if len(compressed) < len(data):
+                    with open(sibling, 'wb') as f:
+                        f.write(compressed)
+                    sizes[encoding] = len(compressed)
+                elif os.path.exists(sibling):
+                    os.remove(sibling)
+            results.append((path, len(data), sizes))
+    return results
@@ -0,0 +1,77 @@
+"""
+    flaskngo.conditional
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Conditional GET (ETag & Last-Modified) from aggregate queries.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import hashlib
+# Third-party imports
+from flask import current_app, request
+from sqlalchemy import func, inspect, select
+# BITSON imports
+from app.extensions import db
+
+
+def _related_tables(model):
+    """Tables whose rows are exported along with `model` rows."""
+    tables = list()
+    for name in model.eager_loads:
+        relationship = inspect(model).relationships[name]
+        tables.append(relationship.mapper.local_table)
+        if relationship.secondary is not None:
+            tables.append(relationship.secondary)
+    return tables
+
+
+def validators(query, model):
+    """Weak ETag & Last-Modified for the rows of `query`.
+
+    Built from `max(updated_on)` and the row count of `query` and of the
+    tables related through `model.eager_loads`, all fetched by a single
+    aggregate query, plus the request path & query string. No row is loaded.
+
+    :returns: an `(etag, last_modified)` tuple.
+    """
+    aggregates = [query.with_entities(
+        func.max(model.updated_on).label('updated_on'),
+        func.count(model.id).label('count')).subquery()]
+    for table in _related_tables(model):
+        aggregates.append(select([
+            func.max(table.c.updated_on).label('updated_on'),
+            func.count().label('count')]).select_from(table).alias())
+    columns = [column for aggregate in aggregates
+               for column in (aggregate.c.updated_on, aggregate.c.count)]
+    values = db.session.query(*columns).one()
+    last_modified = max([value for value in values[::2] if value is not None]
+                        or [None])
+    key = repr((current_app.version, request.full_path, tuple(values)))
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return etag, last_modified
+
+
+def is_not_modified(etag, last_modified):
+    """Whether the client copy is fresh, `If-None-Match` wins over
+    `If-Modified-Since`."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= \
+            request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+
+def not_modified(etag, last_modified):
+    return set_validators(current_app.response_class(status=304), etag,
+                          last_modified)
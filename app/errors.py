@@ -1,7 +1,7 @@
 # Standard Lib imports
 # Third-party imports
-from flask import jsonify
 # BITSON imports
+from app.json_backend import jsonify
 
 
 CUSTOM_ERRORS = [400, 401, 404, 405, 415, 500]
@@ -48,3 +48,10 @@ def forbidden(message, code=403, data=None):
 def not_found(message, code=404, data=None):
     return error_response_template(message=message, code=code, data=data,
                                    error='not found')
+
+
+def service_unavailable(message, code=503, data=None, retry_after=1):
+    response = error_response_template(message=message, code=code, data=data,
+                                       error='service unavailable')
+    response.headers['Retry-After'] = str(retry_after)
+    return response
@@ -0,0 +1,129 @@
+"""
+    flaskngo.event_logs.ingest
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Bulk inserts with PostgreSQL `COPY`, executemany elsewhere.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import io
+from collections import OrderedDict
+from datetime import date, datetime, time
+# Third-party imports
+from sqlalchemy.dialects.postgresql import JSON, JSONB
+# BITSON imports
+from app.json_backend import dumps, loads
+
+
+def _columns(table, rows):
+    """Columns of `table` set by any of the rows, in table order."""
+    keys = set()
+    for row in rows:
+        keys.update(row)
+    return [column for column in table.columns if column.name in keys]
+
+
+def parse_datetime(value):
+    """Naive datetime from an ISO 8601 string, as `isoformat()` writes it."""
+    value = value.replace(' ', 'T', 1)
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError('Invalid datetime: {}'.format(value))
+
+
+def _csv_value(value, column):
+    """A CSV field where unquoted empty is NULL, anything else is quoted."""
+    if value is None:
+        return ''
+    if isinstance(column.type, (JSON, JSONB)):
+        value = dumps(value).decode('utf-8')
+    elif isinstance(value, (date, time)):
+        value = value.isoformat()
+    elif isinstance(value, bool):
+        value = 'true' if value else 'false'
+    else:
+        value = str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
+def to_csv(table, rows, columns=None):
+    """In-memory CSV of `rows` for `COPY ... FROM STDIN WITH (FORMAT csv)`."""
+    columns = columns or _columns(table, rows)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_csv_value(row.get(column.name), column)
+                              for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def copy_rows(session, table, rows):
+    """Inserts `rows` (dicts) into `table` with `COPY` in the transaction of
+    `session`. PostgreSQL (psycopg2) only."""
+    columns = _columns(table, rows)
+    buffer = to_csv(table, rows, columns)
+    statement = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        table.name, ', '.join('"{}"'.format(column.name)
+                              for column in columns))
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+
+def insert_rows(session, table, rows):
+    """Inserts `rows` (dicts) into `table` with a single executemany."""
+    session.execute(table.insert(), rows)
+
+
+def bulk_insert(session, table, rows, use_copy=None):
+    """Inserts `rows` into `table` the fastest way the dialect allows.
+
+    Rows setting different columns are inserted in separate statements, so
+    the columns a row leaves out get their defaults rather than `NULL`.
+
+    :param use_copy: `COPY` or executemany, by default `COPY` on PostgreSQL.
+    """
+    if not rows:
+        return
+    if use_copy is None:
+        use_copy = session.bind.dialect.name == 'postgresql'
+    groups = OrderedDict()
+    for row in rows:
+        groups.setdefault(frozenset(row), list()).append(row)
+    for group in groups.values():
+        if use_copy:
+            copy_rows(session, table, group)
+        else:
+            insert_rows(session, table, group)
+
+
+def load_json_lines(session, table, lines, clean=None, batch_size=5000,
+                    use_copy=None):
+    """Inserts the rows of a JSON lines file (one object per line) in batches
+    of `batch_size`, committing each one.
+
+    :param clean: callable turning each decoded object into a row.
+    :returns: the number of rows inserted.
+    """
+    loaded, batch = 0, list()
+    for line in lines:
+        if not line.strip():
+            continue
+        row = loads(line)
+        batch.append(clean(row) if clean else row)
+        if len(batch) >= batch_size:
+            bulk_insert(session, table, batch, use_copy=use_copy)
+            session.commit()
+            loaded, batch = loaded + len(batch), list()
+    bulk_insert(session, table, batch, use_copy=use_copy)
+    session.commit()
+    return loaded + len(batch)
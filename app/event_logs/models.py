@@ -9,12 +9,14 @@
     :license: AGPL, see LICENSE for more details.
 """
 # Standard lib imports
-import json
 from datetime import datetime
 # Third-party imports
+from flask import current_app
 from sqlalchemy.dialects.postgresql import JSON
 # BITSON imports
 from app.extensions import db, AppModel
+from app.event_logs.ingest import parse_datetime
+from app.event_logs.writer import event_log_writer
 
 
 class ActionGroup(AppModel):
@@ -29,6 +31,9 @@ class Action(AppModel):
 
 
 class EventLog(db.Model):
+    """The table is range partitioned on `created_on` (see
+    :mod:`app.event_logs.partitions`), so filter by time to scan only the
+    relevant partitions."""
     __tablename__ = 'event_logs'
     HTTP_METHODS = {
         'POST': 1,
@@ -37,25 +42,70 @@ class EventLog(db.Model):
         'DELETE': 4,
     }
 
-    id = db.Column(db.Integer, primary_key=True, index=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True,
+                   index=True)
     url = db.Column(db.String(), nullable=False, index=True)
     action_id = db.Column(db.Integer, db.ForeignKey('actions.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('auth_users.id'))
     params = db.Column(JSON)
     response = db.Column(JSON)
     code_version = db.Column(db.String(15), nullable=False, index=True)
-    created_on = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Part of the primary key, as PostgreSQL requires for partitioned tables.
+    created_on = db.Column(db.DateTime, default=datetime.utcnow,
+                           nullable=False, index=True, primary_key=True)
 
     @classmethod
     def register_http(cls, method, response, **kwargs):
-        action_id = cls.HTTP_METHODS[method]
+        """Queues the log of a request, see
+        :data:`app.event_logs.writer.event_log_writer`."""
+        event_log_writer.put(cls.http_row(method, response, **kwargs))
+
+    @classmethod
+    def http_row(cls, method, response, url, user_id=None, params=None,
+                 code_version=None, capture_response=True):
+        """`event_logs` row of a request, ready to insert. Only the status is
+        kept without `capture_response`."""
         rd = {
             'status code': response.status_code,
             'status': response.status,
-            'headers': dict((k, v) for k, v in response.headers.to_list()),
-            'response values': json.loads(response.get_data('utf-8')),
         }
-        event = cls(action_id=action_id, response=rd, **kwargs)
+        if capture_response:
+            body, size = cls.capture_body(response, current_app.config.get(
+                'EVENT_LOG_MAX_BODY_SIZE', 4096))
+            rd.update({
+                'headers': dict(response.headers),
+                'body': body,
+                'body size': size,
+            })
+        return dict(url=url, action_id=cls.HTTP_METHODS[method],
+                    user_id=user_id, params=params, response=rd,
+                    code_version=code_version, created_on=datetime.utcnow())
+
+    @classmethod
+    def import_row(cls, data):
+        """`event_logs` row from an exported one: unknown keys are dropped and
+        `created_on` is parsed, or set to now if missing. Bulk inserts skip
+        the model defaults."""
+        row = dict((key, value) for key, value in data.items()
+                   if key in cls.__table__.columns)
+        created_on = row.get('created_on')
+        if not created_on:
+            row['created_on'] = datetime.utcnow()
+        elif not isinstance(created_on, datetime):
+            row['created_on'] = parse_datetime(created_on)
+        return row
 
-        db.session.add(event)
-        db.session.commit()
+    @staticmethod
+    def capture_body(response, max_size):
+        """Up to `max_size` bytes of the body as text, unparsed, and the body
+        size. Streamed bodies are not captured (their size is `None`)."""
+        if response.is_streamed or response.direct_passthrough:
+            return None, None
+        size = response.calculate_content_length()
+        captured, chunks = 0, list()
+        for chunk in response.iter_encoded():
+            if captured >= max_size:
+                break
+            chunks.append(chunk[:max_size - captured])
+            captured += len(chunks[-1])
+        return b''.join(chunks).decode('utf-8', 'ignore'), size
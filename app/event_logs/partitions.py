@@ -0,0 +1,115 @@
+"""
+    flaskngo.event_logs.partitions
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Range partitions of `event_logs` on `created_on`: creation ahead of time
+    and retention by dropping whole partitions.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import re
+from collections import namedtuple
+from datetime import datetime
+# Third-party imports
+from sqlalchemy import text
+# BITSON imports
+
+TABLE = 'event_logs'
+DEFAULT_PARTITION = TABLE + '_default'
+
+Partition = namedtuple('Partition', 'name start end')
+
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+_PARTITIONS_SQL = """
+SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_class p ON p.oid = i.inhparent
+WHERE p.relname = :table AND pg_table_is_visible(p.oid)
+"""
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    month = value.year * 12 + value.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def partition_for(value, months=1):
+    """Partition holding rows created on `value`. Partitions span `months`
+    months, aligned to the start of the year."""
+    start = month_start(value)
+    start = add_months(start, -((start.month - 1) % months))
+    name = '{}_y{:04d}m{:02d}'.format(TABLE, start.year, start.month)
+    return Partition(name, start, add_months(start, months))
+
+
+def is_partitioned(connection):
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"),
+        table=TABLE).scalar() is not None
+
+
+def _parse_datetime(value):
+    return datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S')
+
+
+def partitions(connection):
+    """Existing range partitions (the default one aside), oldest first."""
+    result = list()
+    for name, bounds in connection.execute(text(_PARTITIONS_SQL),
+                                           table=TABLE):
+        match = _BOUNDS.search(bounds or '')
+        if match is None:  # DEFAULT
+            continue
+        result.append(Partition(name, _parse_datetime(match.group(1)),
+                                _parse_datetime(match.group(2))))
+    return sorted(result, key=lambda partition: partition.start)
+
+
+def create_partitions(connection, ahead=3, months=1, now=None):
+    """Creates the partitions from the current one up to `ahead` partitions
+    later, if missing.
+
+    :returns: the created partitions.
+    """
+    existing = set(partition.name for partition in partitions(connection))
+    partition = partition_for(now or datetime.utcnow(), months)
+    created = list()
+    for _ in range(ahead + 1):
+        if partition.name not in existing:
+            connection.execute(text(
+                'CREATE TABLE "{}" PARTITION OF "{}" '
+                'FOR VALUES FROM (:start) TO (:end)'.format(
+                    partition.name, TABLE)).bindparams(
+                start=partition.start, end=partition.end))
+            created.append(partition)
+        partition = partition_for(partition.end, months)
+    return created
+
+
+def drop_partitions(connection, retention, now=None):
+    """Drops partitions whose rows are all older than `retention` months.
+    Unlike `DELETE`, this leaves neither dead rows nor index bloat behind.
+
+    :returns: the dropped partitions.
+    """
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention)
+    dropped = list()
+    for partition in partitions(connection):
+        if partition.end > cutoff:
+            break
+        connection.execute(text('ALTER TABLE "{}" DETACH PARTITION "{}"'
+                                .format(TABLE, partition.name)))
+        connection.execute(text('DROP TABLE "{}"'.format(partition.name)))
+        dropped.append(partition)
+    return dropped
@@ -0,0 +1,185 @@
+"""
+    flaskngo.event_logs.policies
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Per endpoint event logging policies.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from fnmatch import fnmatchcase
+# Third-party imports
+# BITSON imports
+
+logger = logging.getLogger(__name__)
+
+MODES = ('always', 'default', 'sample', 'errors', 'never')
+
+Policy = namedtuple('Policy', 'mode rate params response')
+
+DEFAULT_POLICY = Policy('default', 1.0, True, True)
+
+
+def make_policy(value):
+    """:class:`Policy` from a config dict like ``{'mode': 'sample',
+    'rate': 0.1, 'params': True, 'response': False}``."""
+    unknown = set(value) - set(Policy._fields)
+    if unknown:
+        raise ValueError('Unknown policy keys: {}'.format(
+            ', '.join(sorted(unknown))))
+    policy = DEFAULT_POLICY._replace(**value)
+    if policy.mode not in MODES:
+        raise ValueError('Policy mode must be one of {}'.format(
+            ', '.join(MODES)))
+    if not 0 <= policy.rate <= 1:
+        raise ValueError('Policy rate must be between 0 and 1')
+    return policy
+
+
+def _specificity(pattern):
+    """Exact names beat patterns, longer patterns beat shorter ones."""
+    literal = not any(char in pattern for char in '*?[')
+    return literal, len(pattern.replace('*', ''))
+
+
+def _matches(pattern, endpoint, rules):
+    if pattern.startswith('/'):
+        return any(fnmatchcase(rule, pattern) for rule in rules)
+    blueprint = endpoint.rpartition('.')[0]
+    return fnmatchcase(endpoint, pattern) or pattern == blueprint
+
+
+def resolve(config, url_map):
+    """Lookup table of the policy of every endpoint of `url_map`.
+
+    `config` keys are endpoints (``'auth.get_user'``), blueprints
+    (``'auth'``), URL rules (``'/auth/users/<int:item_id>'``) or `fnmatch`
+    patterns of them (``'/auth/users/*'``), ``'*'`` is the fallback. The
+    most specific key matching an endpoint wins.
+
+    :returns: a `(table, fallback)` tuple.
+    """
+    policies = sorted(((_specificity(pattern), pattern, make_policy(value))
+                       for pattern, value in config.items()),
+                      key=lambda item: item[0], reverse=True)
+    rules = dict()
+    for rule in url_map.iter_rules():
+        rules.setdefault(rule.endpoint, list()).append(rule.rule)
+    table = dict()
+    for endpoint, endpoint_rules in rules.items():
+        for _, pattern, policy in policies:
+            if _matches(pattern, endpoint, endpoint_rules):
+                table[endpoint] = policy
+                break
+    fallback = config.get('*')
+    return table, make_policy(fallback) if fallback else DEFAULT_POLICY
+
+
+class LoggingPolicies(object):
+    """Resolves the event logging policies to a dict keyed by endpoint, so
+    each request costs a single lookup.
+
+    Policies come from `EVENT_LOG_POLICIES`, updated by the JSON object in
+    `EVENT_LOG_POLICY_FILE` (if any). The file is checked for changes every
+    `EVENT_LOG_POLICY_RELOAD_INTERVAL` seconds and reloaded without a
+    restart. A broken file is logged and the current policies are kept.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.config = dict()
+        self.path = None
+        self.interval = 5
+        self.log_in_db = dict()
+        self._table = dict()
+        self._fallback = DEFAULT_POLICY
+        self._mtime = None
+        self._next_check = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Call it once the blueprints are registered."""
+        self.app = app
+        self.config = app.config.get('EVENT_LOG_POLICIES') or dict()
+        self.path = app.config.get('EVENT_LOG_POLICY_FILE')
+        self.interval = app.config.get('EVENT_LOG_POLICY_RELOAD_INTERVAL',
+                                       self.interval)
+        self.log_in_db = app.config.get('LOG_IN_DB', dict())
+        self._mtime = None
+        self.reload()
+
+    def reload(self):
+        """Resolves the policies again. With a broken file the current ones
+        are kept (or, at startup, those in the app config are used), and the
+        file is only read again once it changes."""
+        overrides, mtime = dict(), None
+        if self.path:
+            try:
+                mtime = os.path.getmtime(self.path)
+                with open(self.path) as f:
+                    overrides = json.load(f)
+                if not isinstance(overrides, dict):
+                    raise TypeError('Event log policies must be an object')
+            except (OSError, TypeError, ValueError):
+                logger.exception('Could not read event log policies from %s',
+                                 self.path)
+                return self._keep(mtime)
+        try:
+            table, fallback = resolve(dict(self.config, **overrides),
+                                      self.app.url_map)
+        except (TypeError, ValueError):
+            if not overrides:
+                raise  # the app config itself is wrong
+            logger.exception('Invalid event log policies in %s', self.path)
+            return self._keep(mtime)
+        self._table, self._fallback, self._mtime = table, fallback, mtime
+        return True
+
+    def _keep(self, mtime):
+        self._mtime = mtime
+        if not self._table:
+            self._table, self._fallback = resolve(self.config,
+                                                  self.app.url_map)
+        return False
+
+    def get(self, endpoint):
+        """Policy of `endpoint`, reloading the file first if it changed."""
+        if self.path and time.monotonic() >= self._next_check:
+            self._check_file()
+        return self._table.get(endpoint, self._fallback)
+
+    def should_log(self, policy, method, status_code):
+        mode = policy.mode
+        if mode == 'always':
+            return True
+        if mode == 'errors':
+            return status_code >= 400
+        if mode == 'sample':
+            return random.random() < policy.rate
+        if mode == 'default':
+            return status_code in self.log_in_db.get(method, ())
+        return False
+
+    def _check_file(self):
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.interval
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+
+logging_policies = LoggingPolicies()
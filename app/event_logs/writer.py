@@ -0,0 +1,184 @@
+"""
+    flaskngo.event_logs.writer
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Asynchronous, batched writer of event logs.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+# Third-party imports
+from flask import has_app_context
+# BITSON imports
+from app.event_logs.ingest import bulk_insert
+from app.extensions import db
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop', 'block')
+
+_STOP = object()
+
+
+class EventLogWriter(object):
+    """Takes event log rows off the request path.
+
+    Requests only put a row (a dict of `event_logs` columns) in a bounded
+    queue. A background thread per process drains it and inserts the rows
+    in batches of up to `batch_size`, or of whatever arrived within
+    `interval` seconds of the first row of the batch. Pending rows are
+    written at shutdown.
+
+    :param queue_size: max rows waiting to be written.
+    :param overflow: with a full queue, ``'drop'`` the new row or
+                     ``'block'`` the request up to `block_timeout` seconds
+                     (and then drop it).
+    """
+
+    def __init__(self, queue_size=10000, overflow='drop', block_timeout=1,
+                 batch_size=500, interval=1):
+        self.enabled = True
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.interval = interval
+        self.app = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('EVENT_LOG_ASYNC', True)
+        self.queue_size = app.config.get('EVENT_LOG_QUEUE_SIZE',
+                                         self.queue_size)
+        self.overflow = app.config.get('EVENT_LOG_OVERFLOW', self.overflow)
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError('EVENT_LOG_OVERFLOW must be one of {}'.format(
+                ', '.join(OVERFLOW_POLICIES)))
+        self.block_timeout = app.config.get('EVENT_LOG_BLOCK_TIMEOUT',
+                                            self.block_timeout)
+        self.batch_size = app.config.get('EVENT_LOG_BATCH_SIZE',
+                                         self.batch_size)
+        self.interval = app.config.get('EVENT_LOG_FLUSH_INTERVAL',
+                                       self.interval)
+        self._queue = queue.Queue(maxsize=self.queue_size)
+
+    def put(self, row):
+        """Queues `row`, or writes it right away when disabled."""
+        if not self.enabled:
+            self.write([row])
+            return True
+        self._ensure_thread()
+        try:
+            if self.overflow == 'block':
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.incr('event_logs.dropped')
+            return False
+        metrics.incr('event_logs.queued')
+        return True
+
+    def write(self, rows):
+        """Inserts `rows` with `COPY`, or a single executemany if the DB is
+        not PostgreSQL."""
+        from app.event_logs.models import EventLog
+
+        if not rows:
+            return
+        if has_app_context():  # inline, within the request
+            self._insert(EventLog, rows)
+        else:
+            with self.app.app_context():
+                self._insert(EventLog, rows)
+
+    @staticmethod
+    def _insert(model, rows):
+        try:
+            bulk_insert(db.session, model.__table__, rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Could not write %d event logs', len(rows))
+            metrics.incr('event_logs.failed', len(rows))
+            return
+        metrics.incr('event_logs.written', len(rows))
+
+    def flush(self):
+        """Writes the queued rows from the calling thread."""
+        rows = list()
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                rows.append(row)
+        for start in range(0, len(rows), self.batch_size):
+            self.write(rows[start:start + self.batch_size])
+
+    def stop(self, timeout=10):
+        thread = self._thread
+        if thread is not None and thread.is_alive() and \
+                self._pid == os.getpid():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            else:
+                thread.join(timeout)
+        self._thread = None
+        if self.app is not None:
+            self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                if self._pid is not None and self._pid != os.getpid():
+                    # Forked: rows queued by the parent are its own.
+                    self._queue = queue.Queue(maxsize=self.queue_size)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run,
+                                                name='event-log-writer',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch, deadline = list(), None
+        while True:
+            timeout = None if not batch else \
+                max(0, deadline - time.monotonic())
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+            if row is _STOP:
+                self.write(batch)
+                return
+            if row is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.interval
+                batch.append(row)
+            if len(batch) >= self.batch_size or \
+                    (batch and time.monotonic() >= deadline):
+                self.write(batch)
+                batch = list()
+
+
+event_log_writer = EventLogWriter()
+atexit.register(event_log_writer.stop)
@@ -1,5 +1,5 @@
 # Standard Lib imports
-from datetime import datetime, date, time, timedelta
+from datetime import datetime
 # Third-party imports
 from celery import Celery
 from flask_cors import CORS
@@ -8,8 +8,10 @@ from flask_mail import Mail
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Sequence
+from sqlalchemy.orm import joinedload, load_only, subqueryload
 from sqlalchemy.sql.expression import func
 # BITSON imports
+from app.serializers import get_serializer
 from config import Config
 
 celery = Celery(__name__, broker=Config.CELERY_BROKER_URL)
@@ -27,7 +29,7 @@ class AppModel(db.Model):
     description = db.Column(db.String(100), nullable=False, index=True)
     created_on = db.Column(db.DateTime, default=datetime.utcnow,
                            nullable=False)
-    updated_on = db.Column(db.DateTime, default=datetime.utcnow(),
+    updated_on = db.Column(db.DateTime, default=datetime.utcnow,
                            nullable=False)
     erased = db.Column(db.Boolean, nullable=False, default=False)
 
@@ -41,19 +43,8 @@ class AppModel(db.Model):
         return "{} --> {}.id={}".format(self.__class__,
                                         self.__class__.__tablename__, self.id)
 
-    def export_data(self, exclude=None):
-        response = dict()
-        for attr, value in self.__dict__.items():
-            if attr.startswith('_'):
-                continue
-            if exclude and attr in exclude:
-                continue
-            if isinstance(value, (date, time, datetime)):
-                value = value.isoformat()
-            if isinstance(value, timedelta):
-                value = value.total_seconds()
-            response.update({attr: value})
-        return response
+    def export_data(self, exclude=None, fields=None):
+        return get_serializer(type(self), exclude, fields)(self)
 
     def set_erased(self, commit=True):
         self.erased = True
@@ -111,6 +102,22 @@ class AppModel(db.Model):
         db.session.execute(query)
         db.session.commit()
 
+    @classmethod
+    def loader_options(cls, fields=None):
+        """Query options loading the declared `eager_loads`.
+
+        :param fields: sparse fieldset, only the columns and relationships in
+                       it are loaded.
+        """
+        loaders = dict(joined=joinedload, subquery=subqueryload)
+        options = [loaders[strategy](getattr(cls, name))
+                   for name, strategy in cls.eager_loads.items()
+                   if fields is None or name in fields]
+        if fields is not None:
+            columns = [name for name in fields if name not in cls.eager_loads]
+            options.append(load_only('id', *columns))
+        return options
+
     @classmethod
     def get_max_id(cls, erased=False):
         return db.session.query(func.max(cls.id)).filter_by(
@@ -137,6 +144,15 @@ class AppModel(db.Model):
     results_per_page = 15
     max_results_per_page = 50
 
+    # Relationships read by `export_data`, loaded along with the rows so
+    # listing them doesn't issue a query per row: {name: 'joined'|'subquery'}
+    eager_loads = dict()
+
+    # Query string filters ({name: app.filters.Filter}) and sortable columns
+    # accepted by collection endpoints, all of them must be indexed.
+    filters = dict()
+    sorts = ('id', )
+
     preprocessors = dict(
         POST=list(),
         GET_SINGLE=list(),
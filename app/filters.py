@@ -0,0 +1,138 @@
+"""
+    flaskngo.filters
+    ~~~~~~~~~~~~~~~~~
+
+    Whitelisted, index backed filters & sorts for collection endpoints.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+from collections import namedtuple
+# Third-party imports
+from sqlalchemy import inspect
+# BITSON imports
+
+#: Query string arguments which are never filters.
+RESERVED_ARGS = frozenset(['limit', 'cursor', 'fields', 'sort', 'stream'])
+
+Sort = namedtuple('Sort', ['name', 'column', 'descending'])
+
+_unindexed_cache = dict()
+
+
+class FilterError(ValueError):
+    """Raised for unknown, unindexed or malformed filters & sorts."""
+
+
+def boolean(value):
+    value = value.lower()
+    if value in ('true', '1', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    raise ValueError(value)
+
+
+def flag(args, name):
+    """Boolean query string flag like `?stream=1`, `False` if missing."""
+    value = args.get(name)
+    if not value:
+        return False
+    try:
+        return boolean(value)
+    except ValueError:
+        raise FilterError('Invalid value for {}'.format(name))
+
+
+def is_indexed(column):
+    """Whether an index (or the primary key) starts with `column`."""
+    if column.primary_key or column.index or column.unique:
+        return True
+    return any(list(index.columns)[0] is column
+               for index in column.table.indexes)
+
+
+class Filter(object):
+    """Filter on a model column, or on a column (`field`) of a related
+    model, e.g. ``Filter('roles', field='name')``.
+
+    :param convert: parses the query string value, raising `ValueError`.
+    """
+
+    def __init__(self, attribute, convert=str, field=None):
+        self.attribute = attribute
+        self.convert = convert
+        self.field = field
+
+    def clause(self, model, raw_value):
+        try:
+            value = self.convert(raw_value)
+        except ValueError:
+            raise FilterError('Invalid value for {}'.format(self.attribute))
+        attribute = getattr(model, self.attribute)
+        if self.field is None:
+            return attribute == value
+        if inspect(model).relationships[self.attribute].uselist:
+            return attribute.any(**{self.field: value})
+        return attribute.has(**{self.field: value})
+
+    def columns(self, model):
+        """Columns which need an index for this filter."""
+        if self.field is None:
+            return [model.__table__.c[self.attribute]]
+        relationship = inspect(model).relationships[self.attribute]
+        return list(relationship.remote_side) + \
+            [relationship.mapper.columns[self.field]]
+
+
+def unindexed(model):
+    """Names of the `model` filters & sorts not backed by an index."""
+    names = [name for name, spec in model.filters.items()
+             if not all(is_indexed(column) for column in spec.columns(model))]
+    names.extend(name for name in model.sorts
+                 if not is_indexed(model.__table__.c[name]))
+    return names
+
+
+def apply_filters(query, model, args):
+    """Adds the filters found in the `args` mapping to `query`.
+
+    :raises: :class:`FilterError` for arguments which are neither reserved
+             nor a filter declared in `model.filters`, and for declared
+             filters without an index.
+    """
+    for name, value in args.items():
+        if name in RESERVED_ARGS:
+            continue
+        spec = model.filters.get(name)
+        if spec is None:
+            raise FilterError('Unknown filter {}'.format(name))
+        if name in _unindexed(model):
+            raise FilterError('Filter {} is not indexed'.format(name))
+        query = query.filter(spec.clause(model, value))
+    return query
+
+
+def parse_sort(model, value):
+    """Parses `sort=name` (ascending) or `sort=-name` (descending).
+
+    :returns: a :class:`Sort`, or `None` to sort by `id`.
+    """
+    if not value:
+        return None
+    descending = value.startswith('-')
+    name = value.lstrip('-')
+    if name not in model.sorts:
+        raise FilterError('Unknown sort {}'.format(name))
+    if name in _unindexed(model):
+        raise FilterError('Sort {} is not indexed'.format(name))
+    return Sort(name=name, column=getattr(model, name), descending=descending)
+
+
+def _unindexed(model):
+    names = _unindexed_cache.get(model)
+    if names is None:
+        names = _unindexed_cache[model] = frozenset(unindexed(model))
+    return names
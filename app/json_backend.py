@@ -0,0 +1,121 @@
+"""
+    flaskngo.json_backend
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    JSON encoding with the fastest available library.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import json
+from datetime import date, datetime, time, timedelta
+# Third-party imports
+from flask import current_app
+from flask.json import JSONEncoder as FlaskJSONEncoder
+# BITSON imports
+
+#: Preferred backends, fastest first.
+BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def default(value):
+    """Our conventions: dates & times as ISO 8601, intervals as seconds."""
+    if isinstance(value, (date, time)):  # datetime is a date too
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """Flask encoder following :func:`default`, for any `flask.jsonify`
+    left (Flask formats dates as HTTP dates by default)."""
+
+    def default(self, o):
+        try:
+            return default(o)
+        except TypeError:
+            return super().default(o)
+
+
+def _json():
+    encoder = json.JSONEncoder(default=default, ensure_ascii=False,
+                               separators=(',', ':'))
+    return lambda obj: encoder.encode(obj).encode('utf-8'), json.loads
+
+
+def _orjson():
+    import orjson
+    return lambda obj: orjson.dumps(obj, default=default), orjson.loads
+
+
+def _ujson():
+    import ujson
+    return (lambda obj: ujson.dumps(obj, default=default,
+                                    ensure_ascii=False).encode('utf-8'),
+            ujson.loads)
+
+
+_LOADERS = dict(orjson=_orjson, ujson=_ujson, json=_json)
+
+# Must encode exactly like the stdlib backend to be used.
+_PROBE = {'at': datetime(2017, 1, 2, 3, 4, 5, 6789), 'on': date(2017, 1, 2),
+          'took': timedelta(seconds=1.5), 'name': 'ñandú', 'ok': True,
+          'none': None, 'items': [1, 2.5]}
+
+
+class JSONBackend(object):
+    """Encodes to & decodes from UTF-8 JSON with `orjson` or `ujson` when
+    installed and behaving like the stdlib, falling back to `json`.
+
+    :param name: ``'auto'`` or one of :data:`BACKENDS`.
+    """
+
+    def __init__(self, name='auto'):
+        self.name = None
+        self.dumps = self.loads = None
+        self.select(name)
+
+    def init_app(self, app):
+        self.select(app.config.get('JSON_BACKEND', 'auto'))
+        app.json_encoder = JSONEncoder
+
+    def select(self, name='auto'):
+        reference = _json()[0](_PROBE)
+        for candidate in BACKENDS if name == 'auto' else (name, ):
+            try:
+                dumps, loads = _LOADERS[candidate]()
+                if candidate != 'json' and \
+                        json.loads(dumps(_PROBE).decode('utf-8')) != \
+                        json.loads(reference.decode('utf-8')):
+                    continue
+            except Exception:
+                if name != 'auto':
+                    raise
+                continue
+            self.name, self.dumps, self.loads = candidate, dumps, loads
+            return self.name
+        raise ValueError('No usable JSON backend {}'.format(name))
+
+
+json_backend = JSONBackend()
+
+
+def dumps(obj):
+    """Encodes `obj` as UTF-8 JSON bytes."""
+    return json_backend.dumps(obj)
+
+
+def loads(data):
+    return json_backend.loads(data)
+
+
+def jsonify(*args, **kwargs):
+    """Drop-in for `flask.jsonify` encoding with :data:`json_backend`."""
+    if args and kwargs:
+        raise TypeError('jsonify takes either args or kwargs, not both')
+    data = args[0] if len(args) == 1 else (args or kwargs)
+    return current_app.response_class(json_backend.dumps(data) + b'\n',
+                                      mimetype='application/json')
@@ -10,24 +10,24 @@
 """
 # Standard lib imports
 # Third-party imports
-from flask import Blueprint, url_for, jsonify, current_app, request, g
+from flask import Blueprint, url_for, current_app, request, g
 from flask_sqlalchemy import get_debug_queries
+from werkzeug.local import LocalProxy
 # BITSON imports
+from ..auth.decorators import roles_required
 from ..event_logs.models import EventLog
+from ..event_logs.policies import logging_policies
+from ..json_backend import jsonify
+from ..metrics import metrics
 
 main = Blueprint('main', __name__, template_folder='templates/')
 
 
 @main.after_app_request
 def after_request(response):
-    if response.status_code in current_app.config.get('LOG_IN_DB').get(
-            request.method) and not current_app.config['TESTING']:
-        EventLog.register_http(
-            url=request.base_url, method=request.method,
-            user_id=0 if not g.current_user else g.current_user.id,
-            params=request.get_json(), response=response,
-            code_version=current_app.version,
-        )
+    if current_app.config.get('EVENT_LOG_ENABLED', True) and \
+            request.method in EventLog.HTTP_METHODS:
+        log_request(response)
     for query in get_debug_queries():
         if query.duration >= current_app.config['SLOW_QUERY_TIMEOUT']:
             current_app.logger.warning(
@@ -37,6 +37,31 @@ def after_request(response):
     return response
 
 
+def log_request(response):
+    policy = logging_policies.get(request.endpoint)
+    if logging_policies.should_log(policy, request.method,
+                                   response.status_code):
+        EventLog.register_http(
+            url=request.base_url, method=request.method,
+            user_id=current_user_id(),
+            params=request.get_json(silent=True) if policy.params else None,
+            response=response, capture_response=policy.response,
+            code_version=current_app.version,
+        )
+
+
+def current_user_id():
+    """Id of the request user without loading it: access tokens carry it in
+    their claims. Unauthorized requests get 0."""
+    claims = getattr(g, 'token_claims', None)
+    if claims:
+        return claims.get('id') or 0
+    user = getattr(g, 'current_user', None)
+    if isinstance(user, LocalProxy):  # only if a view already loaded it
+        user = getattr(g, '_current_user', None)
+    return 0 if user is None else user.id
+
+
 @main.route('/')
 def index():
     response = {
@@ -63,3 +88,13 @@ def about():
         }
     }
     return jsonify(response)
+
+
+@main.route('/metrics')
+@roles_required('root')
+def get_metrics():
+    response = {
+        'url': url_for('main.get_metrics', _external=True),
+        'data': metrics.snapshot(),
+    }
+    return jsonify(response)
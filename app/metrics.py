@@ -0,0 +1,61 @@
+"""
+    flaskngo.metrics
+    ~~~~~~~~~~~~~~~~
+
+    Process-local counters & timers exposed by the metrics view.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import threading
+from collections import defaultdict
+# Third-party imports
+# BITSON imports
+
+
+class Metrics(object):
+    """Thread safe registry of counters and timers.
+
+    Counters are plain integers, timers keep count, total & max seconds.
+    """
+
+    def __init__(self):
+        self._counters = defaultdict(int)
+        self._timers = dict()
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self._timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def counter(self, name):
+        return self._counters.get(name, 0)
+
+    def snapshot(self):
+        with self._lock:
+            timers = dict()
+            for name, (count, total, maximum) in self._timers.items():
+                timers[name] = {
+                    'count': count,
+                    'total': total,
+                    'avg': total / count if count else 0.0,
+                    'max': maximum,
+                }
+            return {'counters': dict(self._counters), 'timers': timers}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,130 @@
+"""
+    flaskngo.pagination
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Keyset (cursor based) pagination helpers.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import base64
+import binascii
+import json
+from datetime import datetime
+# Third-party imports
+from sqlalchemy import and_, or_, tuple_
+# BITSON imports
+
+
+class PaginationError(ValueError):
+    """Raised for malformed `limit` or `cursor` parameters."""
+
+
+def encode_cursor(values):
+    """Opaque cursor for a dict of keyset values."""
+    data = json.dumps(values, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode(
+        'ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Keyset values of a cursor made by :func:`encode_cursor`."""
+    if not cursor:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data.decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, dict) or not isinstance(values.get('id'), int):
+        raise PaginationError('Invalid cursor')
+    return values
+
+
+def page_size(model, limit=None):
+    """Requested page size, capped by the model `max_results_per_page`."""
+    if limit is None or limit == '':
+        return model.results_per_page
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError('Invalid limit')
+    if limit < 1:
+        raise PaginationError('Invalid limit')
+    return min(limit, model.max_results_per_page)
+
+
+def paginate(query, model, limit, cursor=None, sort=None):
+    """Fetches a page of `query` ordered by `sort` (see
+    :func:`app.filters.parse_sort`) then `model.id`, starting after the row
+    the `cursor` points to. Cost is the same for every page, no matter how
+    deep, since an index on `(sort column, id)` skips the previous rows.
+
+    NULLs sort last ascending and first descending (PostgreSQL defaults),
+    so both directions can scan the same index.
+
+    :returns: a `(items, next_cursor)` tuple, `next_cursor` is `None` on the
+              last page.
+    """
+    if sort is None:
+        query = query.order_by(model.id)
+        if cursor:
+            query = query.filter(model.id > cursor['id'])
+    else:
+        column = sort.column
+        if sort.descending:
+            query = query.order_by(column.desc(), model.id.desc())
+        else:
+            query = query.order_by(column, model.id)
+        if cursor:
+            if cursor.get('sort') != sort.name:
+                raise PaginationError('Cursor does not match the sort')
+            query = query.filter(_after(model, sort, cursor))
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    values = {'id': items[-1].id}
+    if sort is not None:
+        value = getattr(items[-1], sort.name)
+        values.update(sort=sort.name, value=value.isoformat()
+                      if isinstance(value, datetime) else value)
+    return items, encode_cursor(values)
+
+
+def _after(model, sort, cursor):
+    """Keyset condition for rows after `cursor` in `sort` order."""
+    column, row_id = sort.column, cursor['id']
+    value = cursor.get('value')
+    if value is not None and _is_datetime(column):
+        try:
+            value = _parse_datetime(value)
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+    if sort.descending:
+        if value is None:
+            return or_(column.isnot(None),
+                       and_(column.is_(None), model.id < row_id))
+        return tuple_(column, model.id) < tuple_(value, row_id)
+    if value is None:
+        return and_(column.is_(None), model.id > row_id)
+    return or_(tuple_(column, model.id) > tuple_(value, row_id),
+               column.is_(None))
+
+
+def _is_datetime(column):
+    try:
+        return issubclass(column.type.python_type, datetime)
+    except NotImplementedError:
+        return False
+
+
+def _parse_datetime(value):
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(value)
@@ -0,0 +1,218 @@
+"""
+    flaskngo.response_cache
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Response cache for read-mostly GET views, invalidated on commit.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+# Third-party imports
+from flask import make_response, request, current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+# BITSON imports
+from app.conditional import is_not_modified, not_modified
+from app.extensions import db
+from app.metrics import metrics
+
+
+class LRUBackend(object):
+    """Process-local backend. Invalidations only reach this process, other
+    processes serve their copies until their TTL expires."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._generations = dict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def generations(self, names):
+        return [self._generations.get(name, 0) for name in names]
+
+    def bump(self, names):
+        with self._lock:
+            for name in names:
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend(object):
+    """Backend shared by every process through Redis, generations are kept
+    in Redis too so invalidations reach all of them."""
+
+    def __init__(self, client, prefix='response_cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl))
+
+    def generations(self, names):
+        values = self.client.mget([self.prefix + 'gen:' + name
+                                   for name in names])
+        return [int(value or 0) for value in values]
+
+    def bump(self, names):
+        pipeline = self.client.pipeline()
+        for name in names:
+            pipeline.incr(self.prefix + 'gen:' + name)
+        pipeline.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ResponseCache(object):
+    """Caches successful responses of GET views.
+
+    Entries are keyed by endpoint, view arguments, query string, a `vary`
+    value (i.e. the caller roles) and the generation of every table the view
+    reads. Commits touching one of those tables bump its generation, so
+    stale entries are never read again and just age out.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 60
+        self.watched = set()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', self.ttl)
+        backend = app.config.get('RESPONSE_CACHE_BACKEND')
+        if backend == 'lru':
+            self.backend = LRUBackend(
+                maxsize=app.config.get('RESPONSE_CACHE_SIZE', 1024))
+        elif backend == 'redis':
+            import redis
+            client = redis.StrictRedis.from_url(
+                app.config.get('RESPONSE_CACHE_REDIS_URL'))
+            prefix = '{}:response_cache:'.format(
+                app.config.get('PROJECT_NAME'))
+            self.backend = RedisBackend(client, prefix=prefix)
+        else:
+            self.backend = None
+
+    def cached(self, *models, vary=None):
+        """Caches a GET view which reads the tables of `models`.
+
+        :param vary: callable returning a value the response depends on.
+        """
+        tables = sorted(model.__tablename__ for model in models)
+        self.watched.update(tables)
+
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                if self.backend is None or request.method != 'GET':
+                    return f(*args, **kwargs)
+                key = self._key(tables, vary)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    status, headers, body, elapsed = entry
+                    metrics.incr('response_cache.hits')
+                    metrics.observe('response_cache.saved', elapsed)
+                    return self._restore(status, headers, body)
+                metrics.incr('response_cache.misses')
+                started = time.perf_counter()
+                response = make_response(f(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, (
+                        response.status_code, response.headers.to_list(),
+                        response.get_data(), time.perf_counter() - started),
+                        self.ttl)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, tables):
+        tables = self.watched.intersection(tables)
+        if tables and self.backend is not None:
+            self.backend.bump(sorted(tables))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def _key(self, tables, vary):
+        generations = self.backend.generations(tables)
+        key = repr((request.endpoint, sorted(request.view_args.items()),
+                    request.query_string,
+                    sorted(vary()) if vary is not None else None,
+                    generations))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _restore(status, headers, body):
+        response = current_app.response_class(body, status=status,
+                                              headers=headers)
+        etag, _ = response.get_etag()
+        if etag and is_not_modified(etag, response.last_modified):
+            return not_modified(etag, response.last_modified)
+        return response
+
+
+response_cache = ResponseCache()
+
+
+@db.event.listens_for(Session, 'after_flush')
+def collect_changed_tables(session, flush_context):
+    if not response_cache.watched:
+        return
+    changed = session.info.setdefault('changed_tables', set())
+    for instance in chain(session.new, session.dirty, session.deleted):
+        state = inspect(instance)
+        changed.add(state.mapper.local_table.name)
+        for relationship in state.mapper.relationships:
+            if relationship.secondary is not None and \
+                    state.attrs[relationship.key].history.has_changes():
+                changed.add(relationship.secondary.name)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def invalidate_changed_tables(session):
+    changed = session.info.pop('changed_tables', None)
+    if changed:
+        response_cache.invalidate(changed)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def forget_changed_tables(session):
+    session.info.pop('changed_tables', None)
@@ -0,0 +1,82 @@
+"""
+    flaskngo.serializers
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Model serializers compiled once per model class from its mapper.
+
+    :copyright: (c) 2016 by Leandro E. Colombo Viña <<@LeCoVi>>.
+    :author: Leandro E. Colombo Viña <colomboleandro at bitson.com.ar>.
+    :license: AGPL, see LICENSE for more details.
+"""
+# Standard lib imports
+import threading
+# Third-party imports
+from sqlalchemy import inspect
+# BITSON imports
+
+MAX_SERIALIZERS = 1024
+
+_serializers = dict()
+_lock = threading.Lock()
+
+
+class FieldsError(ValueError):
+    """Raised for unknown fields in a sparse fieldset."""
+
+
+def _compile(cls, exclude, fields):
+    keys = tuple(prop.key for prop in inspect(cls).column_attrs
+                 if not prop.key.startswith('_') and prop.key not in exclude
+                 and (fields is None or prop.key in fields))
+
+    def serialize(obj):
+        values = obj.__dict__
+        try:
+            return {key: values[key] for key in keys}
+        except KeyError:  # expired or deferred attributes, load them
+            return {key: getattr(obj, key) for key in keys}
+
+    serialize.fields = keys
+    return serialize
+
+
+def get_serializer(cls, exclude=None, fields=None):
+    """Serializer of `cls` instances to dicts.
+
+    Only mapped columns not in `exclude` (and in `fields`, if given) are
+    written. Values are left as loaded, dates & intervals are converted by
+    :mod:`app.json_backend`. Serializers are compiled on first use and cached
+    by model class, `exclude` and `fields`.
+    """
+    key = (cls, frozenset(exclude or ()),
+           frozenset(fields) if fields is not None else None)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        serializer = _compile(cls, key[1], key[2])
+        with _lock:
+            # Fieldsets come from clients, don't let them grow the cache.
+            if len(_serializers) < MAX_SERIALIZERS:
+                _serializers[key] = serializer
+    return serializer
+
+
+def parse_fields(cls, fields, exclude=None):
+    """Validates a comma separated sparse fieldset.
+
+    Allowed fields are the serialized columns plus the relationships the
+    model exports (its `eager_loads`).
+
+    :returns: a frozenset of field names, `None` (every field) if empty.
+    :raises: :class:`FieldsError` for unknown fields.
+    """
+    if not fields:
+        return None
+    names = frozenset(name.strip() for name in fields.split(',')
+                      if name.strip())
+    allowed = set(get_serializer(cls, exclude).fields)
+    allowed.update(getattr(cls, 'eager_loads', ()))
+    unknown = names - allowed
+    if unknown:
+        raise FieldsError('Unknown fields: {}'.format(
+            ', '.join(sorted(unknown))))
+    return names
@@ -25,11 +25,70 @@ class Config:
     PROJECT_NAME = os.environ.get('PROJECT_NAME')
     # SERVER_NAME = 'localhost:8000'
     SECRET_KEY = os.environ.get('SECRET_KEY')
-    SESSION_TTL = 3600
+    # Comma separated, the first key signs new tokens and the rest still
+    # verify older ones, so secrets can be rotated without a mass logout.
+    SECRET_KEYS = [key for key in os.environ.get('SECRET_KEYS', '').split(',')
+                   if key] or [SECRET_KEY]
+    SESSION_TTL = 3600  # refresh tokens
+    # Access tokens are verified without DB access, so user changes (like
+    # deactivation) may take up to this long to apply to them.
+    ACCESS_TOKEN_TTL = 300
 
     AUTH_TOKEN_KEY = 'auth_token'
     AUTH_TOKEN_HEADER = 'Authentication-Token'
     AUTH_CONFIRM_EMAIL = True
+    # Role names signed into auth tokens, role checks then need no queries.
+    AUTH_TOKEN_EMBED_ROLES = True
+
+    # Password hashes run in a process pool, beyond workers + queue size
+    # requests fail fast with 503. Set workers to 0 to hash inline.
+    PASSWORD_HASHING_WORKERS = os.cpu_count() or 1
+    PASSWORD_HASHING_QUEUE_SIZE = 32
+    PASSWORD_HASHING_TIMEOUT = 10
+    # Run `manage.py tune_hashing` to pick these for the host.
+    PASSWORD_HASHING_SCHEME = os.environ.get('PASSWORD_HASHING_SCHEME')
+    PASSWORD_HASHING_ROUNDS = int(os.environ.get('PASSWORD_HASHING_ROUNDS', 0))
+    PASSWORD_HASHING_BUDGET = 0.25  # seconds per hash
+
+    # Buffer login statistics and flush them in batches, `last_login_at`
+    # becomes eventually consistent.
+    LOGIN_STATS_WRITE_BEHIND = False
+    LOGIN_STATS_FLUSH_INTERVAL = 5  # seconds
+    LOGIN_STATS_BATCH_SIZE = 500
+    # Verified tokens cached per process, set size to 0 to disable it.
+    AUTH_TOKEN_CACHE_SIZE = 4096
+    AUTH_TOKEN_CACHE_TTL = 60
+    # Recently rejected (invalid, expired or revoked) tokens, rejected again
+    # without verifying them. Set size to 0 to disable it.
+    AUTH_REJECTED_CACHE_SIZE = 1024
+    AUTH_REJECTED_CACHE_TTL = 30
+    # Revoked token ids are mirrored into a Bloom filter per process, sized
+    # for this many live revocations, and refreshed from the DB every
+    # interval (so logouts reach other processes within it). Each refresh
+    # re-reads revocations created within the slack of the newest one seen,
+    # since concurrent transactions commit their ids out of order.
+    REVOCATION_CAPACITY = 100000
+    REVOCATION_ERROR_RATE = 0.001
+    REVOCATION_REFRESH_INTERVAL = 10  # seconds
+    REVOCATION_REFRESH_SLACK = 60  # seconds
+    # 'auto' picks orjson or ujson when installed, else the stdlib json.
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+    # Rows fetched per query by collection endpoints called with ?stream=1
+    STREAM_BATCH_SIZE = 1000
+    # Cache of read-mostly GET views ('lru', 'redis' or None). The 'lru'
+    # backend is per process: other processes see changes after the TTL.
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'lru')
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL',
+                                              'redis://localhost:6379/1')
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = 60  # seconds
+    # Compress responses of at least this many bytes, with brotli when
+    # installed (else gzip). `manage.py compress_static` writes .br/.gz
+    # static files, served instead of compressing them on every request.
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = 500  # bytes
+    COMPRESSION_LEVEL = 6  # gzip, 1-9
+    COMPRESSION_BROTLI_QUALITY = 4  # 0-11, higher ones are too slow
 
     DOCKER_CONTAINER = '{}-db'.format(PROJECT_NAME)
     DB_SERVICE = os.environ.get('DB_SERVICE')
@@ -67,12 +126,45 @@ class Config:
     DEFAULTS_FOLDER = os.path.join(STATIC_FOLDER, 'defaults')
     DEFAULT_IMAGES_FOLDER = os.path.join(DEFAULTS_FOLDER, 'images')
 
+    # Log requests to event_logs (per EVENT_LOG_POLICIES below).
+    EVENT_LOG_ENABLED = True
+    # Event logs are queued by requests and inserted in batches by a thread
+    # per process. With a full queue new logs are dropped ('drop') or wait
+    # up to EVENT_LOG_BLOCK_TIMEOUT for room ('block'). Set EVENT_LOG_ASYNC
+    # to False to insert them within the request.
+    EVENT_LOG_ASYNC = True
+    EVENT_LOG_QUEUE_SIZE = 10000
+    EVENT_LOG_OVERFLOW = 'drop'
+    EVENT_LOG_BLOCK_TIMEOUT = 1  # seconds
+    EVENT_LOG_BATCH_SIZE = 500
+    EVENT_LOG_FLUSH_INTERVAL = 1  # seconds, max age of a batch
+    # Bytes of the response body stored (unparsed) by event logs.
+    EVENT_LOG_MAX_BODY_SIZE = 4096
+    # event_logs partitions span this many months, `manage.py db partitions`
+    # (run it daily) creates them ahead of time and drops the ones older
+    # than the retention, if any.
+    EVENT_LOG_PARTITION_MONTHS = 1
+    EVENT_LOG_PARTITIONS_AHEAD = 3
+    EVENT_LOG_RETENTION_MONTHS = None
     LOG_IN_DB = {
         'GET': [],
         'POST': [201, 200, 400],
         'PUT': [200, 400],
         'DELETE': [204, 400]
     }
+    # Event logging per endpoint. Keys are endpoints ('auth.get_user'),
+    # blueprints ('auth'), URL rules or fnmatch patterns of them, the most
+    # specific one wins and '*' is the fallback. Modes: 'always', 'default'
+    # (as per LOG_IN_DB), 'sample' (a `rate` fraction of the requests),
+    # 'errors' (4xx & 5xx) and 'never'. `params` & `response` choose what is
+    # stored. EVENT_LOG_POLICY_FILE (JSON, same format) overrides them and
+    # is reloaded when it changes.
+    EVENT_LOG_POLICIES = {
+        '*': {'mode': 'default'},
+        '/auth/users/*': {'mode': 'always'},
+    }
+    EVENT_LOG_POLICY_FILE = os.environ.get('EVENT_LOG_POLICY_FILE')
+    EVENT_LOG_POLICY_RELOAD_INTERVAL = 5  # seconds
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SLOW_QUERY_TIMEOUT = 0.5
@@ -118,8 +210,12 @@ class TestingConfig(Config):
     DEBUG = False
     TESTING = True
 
+    EVENT_LOG_ENABLED = False
+
     SERVER_NAME = os.environ.get('SERVER_NAME') or 'localhost'
 
+    PASSWORD_HASHING_WORKERS = 0
+
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DB_URL') or Config.DB_URI
 
 
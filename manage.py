@@ -21,6 +21,9 @@ app = create_app(os.getenv('FLASK_CONFIG') or 'default')
 manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
+BenchCommand = Manager(usage='Run micro benchmarks')
+manager.add_command('bench', BenchCommand)
+
 
 @manager.command
 def createsuperuser(default=False):
@@ -57,6 +60,28 @@ def createsuperuser(default=False):
         console_logger.critical(error)
 
 
+@manager.command
+def tune_hashing(budget=None, samples=3):
+    """Benchmarks password hashes and picks the strongest within budget."""
+    from app.auth.hashing import tune
+
+    budget = float(budget or app.config.get('PASSWORD_HASHING_BUDGET'))
+    console_logger.debug("Benchmarking password hashes, budget %.3fs...",
+                         budget)
+    results = tune(budget=budget, samples=int(samples))
+    if not results:
+        console_logger.error("No password hash scheme available")
+        return
+    for scheme, rounds, elapsed, recommended in results:
+        console_logger.info("%15s rounds=%-10d %.3fs%s", scheme, rounds,
+                            elapsed, '' if recommended else
+                            ' (below recommended rounds)')
+    scheme, rounds, elapsed, _ = results[0]
+    console_logger.warning("Add to your .env file:")
+    console_logger.warning("PASSWORD_HASHING_SCHEME=%s", scheme)
+    console_logger.warning("PASSWORD_HASHING_ROUNDS=%d", rounds)
+
+
 @manager.command
 def test(coverage=False):
     """Run the unit tests."""
@@ -107,6 +132,21 @@ def profile(length=25):
     app.run()
 
 
+@manager.command
+def compress_static(min_size=500):
+    """ Write .br & .gz siblings of the static files. """
+    from app.compression import compress_static as compress
+    from config import Config
+
+    results = compress(Config.STATIC_FOLDER, min_size=int(min_size),
+                       exclude=[Config.UPLOAD_FOLDER, Config.REPORT_FOLDER])
+    for path, size, sizes in results:
+        console_logger.info("%s: %d bytes, %s", os.path.relpath(
+            path, Config.STATIC_FOLDER), size, ', '.join(
+            '{} {}'.format(encoding, sizes[encoding])
+            for encoding in sorted(sizes)) or 'not compressible')
+
+
 @manager.command
 def make_docs(builder='html', verbose=False, show=False):
     """Creates documentation based on RST files."""
@@ -271,6 +311,58 @@ def rebuild(demo=False, superuser=False):
     create(demo=demo, superuser=superuser)
 
 
+@MigrateCommand.command
+def purge_revoked_tokens():
+    """Delete revocations of tokens already expired."""
+    from datetime import datetime
+    from app.auth.models import RevokedToken
+    from app.extensions import db
+
+    deleted = RevokedToken.query.filter(
+        RevokedToken.expires_at < datetime.utcnow()).delete(
+        synchronize_session=False)
+    db.session.commit()
+    console_logger.info("%d expired revocations deleted", deleted)
+
+
+@MigrateCommand.command
+def import_event_logs(input_file, batch_size=5000):
+    """Load historic event logs from a JSON lines file (one row each)."""
+    from app.event_logs.ingest import load_json_lines
+    from app.event_logs.models import EventLog
+    from app.extensions import db
+
+    with open(input_file, 'rb') as f:
+        imported = load_json_lines(db.session, EventLog.__table__, f,
+                                   clean=EventLog.import_row,
+                                   batch_size=int(batch_size))
+    console_logger.info("%d event logs imported", imported)
+
+
+@MigrateCommand.command
+def partitions(ahead=None, retention=None):
+    """Create upcoming event_logs partitions & drop the expired ones."""
+    from app.event_logs import partitions as event_log_partitions
+    from app.extensions import db
+
+    ahead = int(ahead or app.config['EVENT_LOG_PARTITIONS_AHEAD'])
+    retention = retention or app.config['EVENT_LOG_RETENTION_MONTHS']
+    with db.engine.begin() as connection:
+        if not event_log_partitions.is_partitioned(connection):
+            console_logger.warning("event_logs is not partitioned, run "
+                                   "`manage.py db upgrade` first")
+            return
+        created = event_log_partitions.create_partitions(
+            connection, ahead=ahead,
+            months=app.config['EVENT_LOG_PARTITION_MONTHS'])
+        dropped = event_log_partitions.drop_partitions(
+            connection, int(retention)) if retention else []
+    for partition in created:
+        console_logger.info("Created %s", partition.name)
+    for partition in dropped:
+        console_logger.info("Dropped %s", partition.name)
+
+
 @MigrateCommand.command
 def backup(out="database.sql", force=False):
     """ Uses `pg_dump` in the docker container and gets SQL file for backup. """
@@ -352,5 +444,132 @@ def restore(input_file="database.sql", permanent=True, verbose=False):
     console_logger.debug("DB Backup loaded from %s", filename)
 
 
+@BenchCommand.command
+def tokens(number=10000):
+    """Per-token sign & verify cost, fresh serializers vs token service."""
+    from timeit import timeit
+    from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
+    from app.auth.tokens import tokens as token_service
+
+    number = int(number)
+    secret_key = app.config.get('SECRET_KEY')
+    payload = {'id': 1, 'pv': 0, 'roles': ['root', 'user']}
+
+    def legacy_dumps():
+        return Serializer(secret_key, expires_in=3600).dumps(payload)
+
+    def legacy_loads(token=legacy_dumps()):
+        return Serializer(secret_key).loads(token)
+
+    def service_dumps():
+        return token_service.dumps('auth', payload, expires_in=3600)
+
+    def service_loads(token=service_dumps()):
+        return token_service.loads(token, 'auth')
+
+    for name, func in [('fresh serializer sign', legacy_dumps),
+                       ('fresh serializer verify', legacy_loads),
+                       ('token service sign', service_dumps),
+                       ('token service verify', service_loads)]:
+        elapsed = timeit(func, number=number)
+        console_logger.info("%25s: %8.2f us/token", name,
+                            elapsed / number * 1e6)
+
+
+@BenchCommand.command
+def serializers(number=20):
+    """Rows per second serialized by export_data, legacy vs compiled."""
+    from datetime import date, time, datetime, timedelta
+    from timeit import timeit
+    from app.auth.models import User
+    from app.serializers import get_serializer
+
+    number = int(number)
+    users = User.query.all()
+    exclude = ['password_hash']
+
+    def legacy_export_data(item):
+        response = dict()
+        for attr, value in item.__dict__.items():
+            if attr.startswith('_'):
+                continue
+            if exclude and attr in exclude:
+                continue
+            if isinstance(value, (date, time, datetime)):
+                value = value.isoformat()
+            if isinstance(value, timedelta):
+                value = value.total_seconds()
+            response.update({attr: value})
+        return response
+
+    compiled = get_serializer(User, exclude)
+    for name, func in [('legacy export_data', legacy_export_data),
+                       ('compiled serializer', compiled)]:
+        elapsed = timeit(lambda: [func(user) for user in users],
+                         number=number)
+        console_logger.info("%25s: %10.0f rows/s", name,
+                            len(users) * number / elapsed)
+
+
+@BenchCommand.command
+def json(number=20):
+    """Encode & decode time of every JSON backend on real payloads."""
+    from timeit import timeit
+    from app.auth.models import User, Role, RoleGroup
+    from app.json_backend import BACKENDS, JSONBackend
+
+    number = int(number)
+    payloads = [
+        ('users', {'data': [user.export_data(exclude=['password_hash'])
+                            for user in User.query.all()]}),
+        ('roles', {'data': [role.export_data() for role in Role.query.all()]}),
+        ('role groups', {'data': [role_group.export_data()
+                                  for role_group in RoleGroup.query.all()]}),
+    ]
+    for name in BACKENDS:
+        try:
+            backend = JSONBackend(name)
+        except Exception as error:
+            console_logger.warning("%s: not available (%s)", name, error)
+            continue
+        for payload_name, payload in payloads:
+            encoded = backend.dumps(payload)
+            dumps = timeit(lambda: backend.dumps(payload), number=number)
+            loads = timeit(lambda: backend.loads(encoded), number=number)
+            console_logger.info("%8s %12s: dumps %8.1f us, loads %8.1f us, "
+                                "%d bytes", name, payload_name,
+                                dumps / number * 1e6, loads / number * 1e6,
+                                len(encoded))
+
+
+@BenchCommand.command
+def event_logs(rows=20000, batch_size=1000):
+    """Rows per second inserted into event_logs, executemany vs COPY."""
+    import time
+    from datetime import datetime
+    from app.event_logs.ingest import copy_rows, insert_rows
+    from app.event_logs.models import EventLog
+    from app.extensions import db
+
+    rows, batch_size = int(rows), int(batch_size)
+    table = EventLog.__table__
+    data = [dict(url='http://localhost/auth/users/{}'.format(number),
+                 action_id=3, user_id=None, params={'username': 'bench'},
+                 response={'status code': 200, 'status': '200 OK'},
+                 code_version=app.version, created_on=datetime.utcnow())
+            for number in range(rows)]
+    methods = [('executemany', insert_rows)]
+    if db.engine.dialect.name == 'postgresql':
+        methods.append(('copy', copy_rows))
+    for name, insert in methods:
+        started = time.perf_counter()
+        for start in range(0, rows, batch_size):
+            insert(db.session, table, data[start:start + batch_size])
+        db.session.flush()
+        elapsed = time.perf_counter() - started
+        db.session.rollback()  # leave no bench rows behind
+        console_logger.info("%12s: %10.0f rows/s", name, rows / elapsed)
+
+
 if __name__ == '__main__':
     manager.run()
@@ -0,0 +1,113 @@
+"""Partition event_logs by created_on
+
+Revision ID: a7c3e9f1b2d4
+Revises: 2b6e9f4c8d15
+Create Date: 2017-02-24 11:05:17.203418
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9f1b2d4'
+down_revision = '2b6e9f4c8d15'
+branch_labels = None
+depends_on = None
+
+# Needs PostgreSQL 11+ (primary keys, foreign keys, indexes & a default
+# partition on partitioned tables).
+CREATE_PARTITIONED = """
+CREATE TABLE event_logs (
+    id INTEGER NOT NULL DEFAULT nextval('event_logs_id_seq'),
+    url VARCHAR NOT NULL,
+    action_id INTEGER REFERENCES actions (id),
+    user_id INTEGER REFERENCES auth_users (id),
+    params JSON,
+    response JSON,
+    code_version VARCHAR(15) NOT NULL,
+    created_on TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (id, created_on)
+) PARTITION BY RANGE (created_on)
+"""
+
+CREATE_PLAIN = """
+CREATE TABLE event_logs (
+    id INTEGER NOT NULL DEFAULT nextval('event_logs_id_seq'),
+    url VARCHAR NOT NULL,
+    action_id INTEGER REFERENCES actions (id),
+    user_id INTEGER REFERENCES auth_users (id),
+    params JSON,
+    response JSON,
+    code_version VARCHAR(15) NOT NULL,
+    created_on TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (id)
+)
+"""
+
+COLUMNS = 'id, url, action_id, user_id, params, response, code_version, ' \
+          'created_on'
+
+INDEXES = [
+    ('ix_event_logs_code_version', ['code_version']),
+    ('ix_event_logs_id', ['id']),
+    ('ix_event_logs_url', ['url']),
+]
+
+
+def _add_months(value, months):
+    month = value.year * 12 + value.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def _create_partitions(first, last):
+    """Monthly partitions from the month of `first` to the one of `last`."""
+    start = datetime(first.year, first.month, 1)
+    while start <= last:
+        end = _add_months(start, 1)
+        op.execute(sa.text(
+            'CREATE TABLE event_logs_y{:04d}m{:02d} PARTITION OF event_logs '
+            'FOR VALUES FROM (:start) TO (:end)'.format(
+                start.year, start.month)).bindparams(start=start, end=end))
+        start = end
+
+
+def _swap_table(create):
+    connection = op.get_bind()
+    for name, _ in INDEXES:
+        op.drop_index(op.f(name), table_name='event_logs')
+    op.execute('ALTER TABLE event_logs RENAME TO event_logs_old')
+    op.execute('ALTER TABLE event_logs_old '
+               'RENAME CONSTRAINT event_logs_pkey TO event_logs_old_pkey')
+    op.execute(create)
+    op.execute('ALTER SEQUENCE event_logs_id_seq OWNED BY event_logs.id')
+    return connection
+
+
+def upgrade():
+    connection = _swap_table(CREATE_PARTITIONED)
+    op.execute('CREATE TABLE event_logs_default PARTITION OF event_logs '
+               'DEFAULT')
+    oldest = connection.execute(
+        sa.text('SELECT min(created_on) FROM event_logs_old')).scalar()
+    now = datetime.utcnow()
+    # Partitions for the months already logged plus three ahead.
+    _create_partitions(min(oldest or now, now), _add_months(now, 3))
+    op.execute('INSERT INTO event_logs ({0}) SELECT {0} FROM event_logs_old'
+               .format(COLUMNS))
+    op.drop_table('event_logs_old')
+    for name, columns in INDEXES + [('ix_event_logs_created_on',
+                                     ['created_on'])]:
+        op.create_index(op.f(name), 'event_logs', columns, unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_event_logs_created_on'), table_name='event_logs')
+    _swap_table(CREATE_PLAIN)
+    op.execute('INSERT INTO event_logs ({0}) SELECT {0} FROM event_logs_old'
+               .format(COLUMNS))
+    op.execute('DROP TABLE event_logs_old CASCADE')
+    for name, columns in INDEXES:
+        op.create_index(op.f(name), 'event_logs', columns, unique=False)
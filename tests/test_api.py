@@ -1,8 +1,10 @@
 # Standard Lib imports
 import json
 import unittest
+from contextlib import contextmanager
 # Third-party imports
 from flask import url_for, current_app
+from sqlalchemy import event
 # BITSON imports
 from app import create_app
 from app.extensions import db
@@ -57,6 +59,27 @@ class APITestCaseBase(unittest.TestCase):
         return User.create_with_role(username=name, password=name, role=role,
                                      email="{}@demouser.com".format(name))
 
+    @contextmanager
+    def count_queries(self):
+        """Collects the SQL statements executed within the block."""
+        statements = list()
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+    @contextmanager
+    def assertNumQueries(self, number):
+        with self.count_queries() as statements:
+            yield
+        self.assertEqual(len(statements), number, '\n'.join(statements))
+
     @staticmethod
     def get_json_response(response):
         return json.loads(response.data.decode('utf-8'))
@@ -82,5 +105,24 @@ class APITestCase(APITestCaseBase):
                                                       _external=True)
         )
 
+    def test_metrics(self):
+        self.login()
+        url = url_for('main.get_metrics', _external=True)
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(
+                                       token=self.auth_token),
+                                   )
+        response.json = self.get_json_response(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hashing.hash_time', response.json['data']['timers'])
+
+    def test_metrics_unauthorized(self):
+        url = url_for('main.get_metrics', _external=True)
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(),
+                                   )
+        self.assertEqual(response.status_code, 401)
+
+
 if __name__ == '__main__':
     unittest.main()
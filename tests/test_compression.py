@@ -0,0 +1,101 @@
+# Standard Lib imports
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+# Third-party imports
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse, Response
+# BITSON imports
+from app.compression import CompressionMiddleware, compress_static, negotiate
+
+
+class CompressionTestCase(unittest.TestCase):
+    body = b'{"data": [' + b', '.join([b'"item"'] * 200) + b']}'
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        with open(os.path.join(self.folder, 'style.css'), 'wb') as f:
+            f.write(b'body { margin: 0; }\n' * 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def client(self, response, min_size=500):
+        def app(environ, start_response):
+            return response(environ, start_response)
+        middleware = CompressionMiddleware(app, min_size=min_size,
+                                           static_folder=self.folder)
+        return Client(middleware, BaseResponse)
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate('gzip, deflate', ['gzip']), 'gzip')
+        self.assertEqual(negotiate('gzip;q=0', ['gzip']), None)
+        self.assertEqual(negotiate('*', ['gzip']), 'gzip')
+        self.assertEqual(negotiate('', ['gzip']), None)
+        self.assertEqual(negotiate('gzip', []), None)
+
+    def test_compress(self):
+        client = self.client(Response(self.body,
+                                      mimetype='application/json'))
+        response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data), self.body)
+        self.assertEqual(int(response.headers['Content-Length']),
+                         len(response.data))
+
+    def test_below_threshold(self):
+        client = self.client(Response(b'{}', mimetype='application/json'))
+        response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(response.data, b'{}')
+
+    def test_not_accepted(self):
+        client = self.client(Response(self.body,
+                                      mimetype='application/json'))
+        response = client.get('/')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(response.data, self.body)
+
+    def test_not_compressible(self):
+        client = self.client(Response(self.body, mimetype='image/png'))
+        response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Vary', response.headers)
+
+    def test_streamed(self):
+        client = self.client(Response(iter([self.body]),
+                                      mimetype='application/json'))
+        response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, self.body)
+
+    def test_precompressed_static(self):
+        compress_static(self.folder)
+        path = os.path.join(self.folder, 'style.css')
+        self.assertTrue(os.path.exists(path + '.gz'))
+        served = list()
+
+        def app(environ, start_response):
+            served.append(environ['PATH_INFO'])
+            return Response(b'compressed', mimetype='application/gzip')(
+                environ, start_response)
+        client = self.client(app)
+        response = client.get('/style.css',
+                              headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(served[-1], '/style.css.gz')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Content-Type'], 'text/css')
+        client.get('/style.css')
+        self.assertEqual(served[-1], '/style.css')
+
+    def test_compress_static_skips_larger(self):
+        path = os.path.join(self.folder, 'random.bin')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(1024))
+        compress_static(self.folder)
+        self.assertFalse(os.path.exists(path + '.gz'))
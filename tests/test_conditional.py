@@ -0,0 +1,65 @@
+# Standard Lib imports
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import Role
+from app.auth.revocation import revocations
+from app.extensions import db
+from app.response_cache import response_cache
+
+
+class ConditionalGetTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+        revocations.refresh()
+        revocations.refresh_interval = 3600
+        # Cached responses would skip the queries under test.
+        response_cache.backend = None
+
+    def get(self, url, **headers):
+        return self.client.get(url, content_type=self.JSON,
+                               headers=self.set_api_headers(
+                                   token=self.auth_token, **headers),
+                               )
+
+    def test_collection_not_modified(self):
+        url = url_for('auth.get_roles', _external=True)
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers.get('ETag')
+        self.assertTrue(etag.startswith('W/'))
+        self.assertIsNotNone(response.headers.get('Last-Modified'))
+        with self.assertNumQueries(1):
+            response = self.get(url, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+    def test_collection_modified(self):
+        url = url_for('auth.get_role_groups', _external=True)
+        etag = self.get(url).headers.get('ETag')
+        role = Role.get_by(name='user')
+        description = role.description
+        role.description = 'Changed description'
+        db.session.commit()
+        response = self.get(url, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers.get('ETag'), etag)
+        role.description = description
+        db.session.commit()
+
+    def test_query_string_changes_etag(self):
+        first = self.get(url_for('auth.get_roles', _external=True))
+        second = self.get(url_for('auth.get_roles', fields='name',
+                                  _external=True))
+        self.assertNotEqual(first.headers.get('ETag'),
+                            second.headers.get('ETag'))
+
+    def test_item_if_modified_since(self):
+        role = Role.get_by(name='root')
+        url = url_for('auth.get_role', item_id=role.id, _external=True)
+        response = self.get(url)
+        last_modified = response.headers.get('Last-Modified')
+        response = self.get(url, **{'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,153 @@
+# Standard Lib imports
+import io
+import json
+from datetime import datetime
+# Third-party imports
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.event_logs.ingest import (copy_rows, insert_rows, load_json_lines,
+                                   to_csv)
+from app.event_logs.models import EventLog
+from app.event_logs.writer import EventLogWriter
+from app.extensions import db
+from app.metrics import metrics
+
+
+class EventLogWriterTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        self.writer = EventLogWriter(queue_size=10, batch_size=3,
+                                     interval=0.05)
+        self.writer.app = self.app
+
+    def tearDown(self):
+        self.writer.stop()
+        EventLog.query.filter(EventLog.url.like('/writer/%')).delete(
+            synchronize_session=False)
+        db.session.commit()
+        super().tearDown()
+
+    def row(self, number):
+        return dict(url='/writer/{}'.format(number), action_id=1,
+                    user_id=None, params={'number': number}, response=None,
+                    code_version=self.app.version,
+                    created_on=datetime.utcnow())
+
+    def written(self):
+        db.session.expire_all()
+        return EventLog.query.filter(EventLog.url.like('/writer/%')).count()
+
+    def test_flush_on_stop(self):
+        for number in range(5):
+            self.assertTrue(self.writer.put(self.row(number)))
+        self.writer.stop()
+        self.assertEqual(self.written(), 5)
+
+    def test_disabled_writes_inline(self):
+        self.writer.enabled = False
+        self.writer.put(self.row(0))
+        self.assertEqual(self.written(), 1)
+
+    def test_drop_when_full(self):
+        self.writer.queue_size = 1
+        self.writer._ensure_thread = lambda: None  # nothing drains it
+        self.writer._queue.maxsize = 1
+        dropped = metrics.counter('event_logs.dropped')
+        self.assertTrue(self.writer.put(self.row(0)))
+        self.assertFalse(self.writer.put(self.row(1)))
+        self.assertEqual(metrics.counter('event_logs.dropped'), dropped + 1)
+        self.writer.flush()
+        self.assertEqual(self.written(), 1)
+
+    def test_block_when_full(self):
+        self.writer.overflow, self.writer.block_timeout = 'block', 0.01
+        self.writer._ensure_thread = lambda: None
+        self.writer._queue.maxsize = 1
+        self.assertTrue(self.writer.put(self.row(0)))
+        self.assertFalse(self.writer.put(self.row(1)))
+
+
+class BulkInsertTestCase(APITestCaseBase):
+    def tearDown(self):
+        db.session.rollback()
+        super().tearDown()
+
+    def rows(self):
+        return [dict(url='/ingest/{}'.format(number), action_id=1,
+                     user_id=None, params=params, response=None,
+                     code_version='', created_on=datetime(2017, 1, 2, 3))
+                for number, params in enumerate(
+                    [None, {'name': 'a "quoted", value\n'}, ['ñ']])]
+
+    def assertInserted(self, insert):
+        insert(db.session, EventLog.__table__, self.rows())
+        inserted = EventLog.query.filter(EventLog.url.like('/ingest/%')) \
+            .order_by(EventLog.url).all()
+        self.assertEqual([(item.params, item.response, item.code_version,
+                           item.created_on) for item in inserted],
+                         [(row['params'], None, '', row['created_on'])
+                          for row in self.rows()])
+
+    def test_insert_rows(self):
+        self.assertInserted(insert_rows)
+
+    def test_copy_rows(self):
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('COPY needs PostgreSQL')
+        self.assertInserted(copy_rows)
+
+    def test_csv(self):
+        buffer = to_csv(EventLog.__table__, self.rows()[:2])
+        lines = buffer.getvalue().splitlines()
+        self.assertEqual(lines[0], '"/ingest/0","1",,,,"",'
+                                   '"2017-01-02T03:00:00"')
+
+    def test_csv_columns_of_every_row(self):
+        rows = [dict(url='/ingest/0'), dict(url='/ingest/1', code_version='a')]
+        lines = to_csv(EventLog.__table__, rows).getvalue().splitlines()
+        self.assertEqual(lines, ['"/ingest/0",', '"/ingest/1","a"'])
+
+    def test_load_json_lines_mixed_keys(self):
+        rows = [
+            dict(url='/ingest/0', action_id=1, code_version='',
+                 created_on='2017-01-02T03:04:05.000006'),
+            dict(url='/ingest/1', action_id=2, code_version='',
+                 params={'a': 1}, unknown='dropped'),
+            dict(url='/ingest/2', code_version='',
+                 created_on='2017-01-02 03:04:05'),
+        ]
+        lines = io.BytesIO(b'\n'.join(json.dumps(row).encode('utf-8')
+                                      for row in rows) + b'\n\n')
+        loaded = load_json_lines(db.session, EventLog.__table__, lines,
+                                 clean=EventLog.import_row, batch_size=2,
+                                 use_copy=False)
+        self.assertEqual(loaded, 3)
+        inserted = EventLog.query.filter(EventLog.url.like('/ingest/%')) \
+            .order_by(EventLog.url).all()
+        self.assertEqual([(item.action_id, item.params) for item in inserted],
+                         [(1, None), (2, {'a': 1}), (None, None)])
+        self.assertEqual(inserted[0].created_on,
+                         datetime(2017, 1, 2, 3, 4, 5, 6))
+        self.assertIsNotNone(inserted[1].created_on)
+        self.assertEqual(inserted[2].created_on, datetime(2017, 1, 2, 3, 4, 5))
+        EventLog.query.filter(EventLog.url.like('/ingest/%')).delete(
+            synchronize_session=False)
+        db.session.commit()
+
+
+class CaptureBodyTestCase(APITestCaseBase):
+    def test_truncated(self):
+        body = '{"name": "ñandú"}' * 100
+        response = self.app.response_class(body, mimetype='application/json')
+        self.app.config['EVENT_LOG_MAX_BODY_SIZE'] = 11  # half of ñ
+        row = EventLog.http_row('POST', response, url='/users')
+        self.assertEqual(row['response']['body'], body[:10])
+        self.assertEqual(row['response']['body size'],
+                         len(body.encode('utf-8')))
+        self.assertEqual(row['response']['headers']['Content-Type'],
+                         'application/json')
+
+    def test_streamed(self):
+        response = self.app.response_class(iter([b'{}']),
+                                           mimetype='application/json')
+        self.assertEqual(EventLog.capture_body(response, 100), (None, None))
@@ -0,0 +1,61 @@
+# Standard Lib imports
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import User
+
+
+class FieldsTestCase(APITestCaseBase):
+    def get(self, url):
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(
+                                       token=self.auth_token),
+                                   )
+        response.json = self.get_json_response(response)
+        return response
+
+    def test_users_fields(self):
+        self.login()
+        url = url_for('auth.get_users', fields='id,username', _external=True)
+        with self.count_queries() as statements:
+            response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        for item in response.json['data']:
+            self.assertEqual(set(item), {'id', 'username'})
+        self.assertFalse(any('password_hash' in statement
+                             for statement in statements))
+        self.assertFalse(any('auth_roles' in statement
+                             for statement in statements))
+
+    def test_users_fields_with_roles(self):
+        self.login()
+        url = url_for('auth.get_users', fields='username,roles',
+                      _external=True)
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        for item in response.json['data']:
+            self.assertEqual(set(item), {'username', 'roles'})
+
+    def test_user_fields(self):
+        self.login()
+        user = User.get_by(username='bitson')
+        url = url_for('auth.get_user', item_id=user.id, fields='email',
+                      _external=True)
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['data'], {'email': user.email})
+
+    def test_excluded_field(self):
+        self.login()
+        url = url_for('auth.get_users', fields='id,password_hash',
+                      _external=True)
+        response = self.get(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json['error'] == 'bad request')
+
+    def test_unknown_field(self):
+        self.login()
+        url = url_for('auth.get_roles', fields='id,nope', _external=True)
+        response = self.get(url)
+        self.assertEqual(response.status_code, 400)
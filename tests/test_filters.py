@@ -0,0 +1,80 @@
+# Standard Lib imports
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import User, Role, RoleGroup
+from app.filters import unindexed
+
+
+class FiltersTestCase(APITestCaseBase):
+    def get(self, url):
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(
+                                       token=self.auth_token),
+                                   )
+        response.json = self.get_json_response(response)
+        return response
+
+    def get_all(self, url):
+        items = list()
+        while url:
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            items.extend(response.json['data'])
+            url = response.json['next']
+        return items
+
+    def test_filters_are_indexed(self):
+        for model in (User, Role, RoleGroup):
+            self.assertEqual(unindexed(model), [])
+
+    def test_filter_active(self):
+        self.login()
+        url = url_for('auth.get_users', active='true', _external=True)
+        items = self.get_all(url)
+        self.assertEqual(len(items), User.query.filter_by(
+            erased=False, active=True).count())
+        self.assertTrue(all(item['active'] for item in items))
+
+    def test_filter_role(self):
+        self.login()
+        url = url_for('auth.get_users', role='root', limit=1, _external=True)
+        items = self.get_all(url)
+        self.assertTrue(items)
+        for item in items:
+            self.assertIn('root', [role['name'] for role in item['roles']])
+
+    def test_sort_descending(self):
+        self.login()
+        url = url_for('auth.get_users', sort='-username', limit=2,
+                      fields='username', _external=True)
+        names = [item['username'] for item in self.get_all(url)]
+        self.assertEqual(names, sorted(names, reverse=True))
+        self.assertEqual(len(names),
+                         User.query.filter_by(erased=False).count())
+
+    def test_sort_nullable(self):
+        self.login()
+        url = url_for('auth.get_users', sort='-last_login_at', limit=1,
+                      _external=True)
+        ids = [item['id'] for item in self.get_all(url)]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), User.query.filter_by(erased=False).count())
+
+    def test_unknown_filter(self):
+        self.login()
+        url = url_for('auth.get_users', password_hash='x', _external=True)
+        response = self.get(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json['error'] == 'bad request')
+
+    def test_invalid_filter_value(self):
+        self.login()
+        url = url_for('auth.get_users', active='maybe', _external=True)
+        self.assertEqual(self.get(url).status_code, 400)
+
+    def test_unknown_sort(self):
+        self.login()
+        url = url_for('auth.get_roles', sort='description', _external=True)
+        self.assertEqual(self.get(url).status_code, 400)
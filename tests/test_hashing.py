@@ -0,0 +1,155 @@
+# Standard Lib imports
+import time
+import unittest
+# Third-party imports
+from passlib.registry import get_crypt_handler
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.hashing import (HashingExecutor, HashingQueueFull,
+                              HashingTimeout, HashingUnavailable, hasher,
+                              build_context, fit_rounds, tune)
+from app.auth.models import User
+from app.extensions import db
+from app.metrics import metrics
+
+
+def slow_executor(workers=1, queue_size=0, timeout=10):
+    executor = HashingExecutor(workers=workers, queue_size=queue_size,
+                               timeout=timeout)
+    # About a second per hash, enough to keep the worker busy.
+    executor.context = build_context('sha512_crypt', rounds=2000000)
+    executor.policy = executor.context.to_string()
+    return executor
+
+
+class HashingPoolTestCase(unittest.TestCase):
+    def test_pool_hash(self):
+        executor = HashingExecutor(workers=1, queue_size=1, timeout=30)
+        self.addCleanup(executor.shutdown)
+        password_hash = executor.hash('secret')
+        self.assertTrue(executor.verify('secret', password_hash))
+        self.assertFalse(executor.verify('other', password_hash))
+
+    def test_queue_full(self):
+        executor = slow_executor(workers=1, queue_size=0)
+        self.addCleanup(executor.shutdown)
+        executor.submit('hash', 'first')
+        with self.assertRaises(HashingQueueFull):
+            executor.hash('second')
+
+    def test_timeout(self):
+        executor = slow_executor(timeout=0.01)
+        self.addCleanup(executor.shutdown)
+        with self.assertRaises(HashingTimeout):
+            executor.hash('secret')
+
+    def test_broken_pool_is_rebuilt(self):
+        executor = HashingExecutor(workers=1, queue_size=1, timeout=30)
+        self.addCleanup(executor.shutdown)
+        executor.hash('warm up')
+        for process in list(executor._pool._processes.values()):
+            process.kill()
+        time.sleep(0.5)  # let the pool notice
+        with self.assertRaises(HashingUnavailable):
+            executor.hash('secret')
+        self.assertTrue(executor.verify('secret', executor.hash('secret')))
+
+
+class HashingBackPressureTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        hasher.workers, hasher.queue_size = 1, 0
+        hasher.shutdown()
+
+    def tearDown(self):
+        hasher.shutdown()
+        hasher.workers, hasher.queue_size = 0, 0
+        super().tearDown()
+
+    def test_login_when_busy(self):
+        hasher._get_pool()
+        self.assertTrue(hasher._slots.acquire(blocking=False))
+        try:
+            response = self.login()
+        finally:
+            hasher._slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.login().status_code, 200)
+
+
+class RehashTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        hasher.context = build_context('sha256_crypt', rounds=1000)
+        hasher.policy = hasher.context.to_string()
+        self.user = User.get_by(username='bitson')
+        self.original_hash = self.user.password_hash
+
+    def tearDown(self):
+        self.set_hash(self.original_hash)
+        hasher.init_app(self.app)
+        super().tearDown()
+
+    def set_hash(self, password_hash):
+        User.query.filter_by(id=self.user.id).update(
+            {User.password_hash: password_hash}, synchronize_session=False)
+        db.session.commit()
+
+    def stored_hash(self):
+        db.session.expire_all()
+        return User.query.get(self.user.id).password_hash
+
+    def wait_for_rehash(self, old_hash, seconds=5):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if self.stored_hash() != old_hash:
+                break
+            time.sleep(0.05)
+        return self.stored_hash()
+
+    def test_needs_update(self):
+        current = hasher.context.hash('bitson')
+        self.assertFalse(hasher.needs_update(current))
+        other_scheme = build_context('sha512_crypt', rounds=1000)
+        self.assertTrue(hasher.needs_update(other_scheme.hash('bitson')))
+        other_rounds = build_context('sha256_crypt', rounds=2000)
+        self.assertTrue(hasher.needs_update(other_rounds.hash('bitson')))
+        self.assertFalse(hasher.needs_update(None))
+
+    def test_outdated_hash_replaced_after_login(self):
+        outdated = build_context('sha512_crypt', rounds=1000).hash('bitson')
+        self.set_hash(outdated)
+        self.assertEqual(self.login().status_code, 200)
+        new_hash = self.wait_for_rehash(outdated)
+        self.assertNotEqual(new_hash, outdated)
+        self.assertFalse(hasher.needs_update(new_hash))
+        self.assertTrue(hasher.context.verify('bitson', new_hash))
+
+    def test_current_hash_left_alone(self):
+        current = hasher.context.hash('bitson')
+        self.set_hash(current)
+        rehashed = metrics.counter('hashing.rehashed')
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.stored_hash(), current)
+        self.assertEqual(metrics.counter('hashing.rehashed'), rehashed)
+
+    def test_concurrent_change_not_overwritten(self):
+        outdated = build_context('sha512_crypt', rounds=1000).hash('bitson')
+        changed = hasher.context.hash('changed meanwhile')
+        self.set_hash(changed)
+        User.store_rehash(self.app, self.user.id, outdated,
+                          hasher.context.hash('bitson'))
+        self.assertEqual(self.stored_hash(), changed)
+
+
+class TuneTestCase(unittest.TestCase):
+    def test_fit_rounds(self):
+        handler = get_crypt_handler('sha256_crypt')
+        rounds, elapsed = fit_rounds('sha256_crypt', budget=0.01, samples=1)
+        self.assertGreaterEqual(rounds, handler.min_rounds)
+        self.assertLessEqual(rounds, handler.max_rounds)
+        self.assertGreater(elapsed, 0)
+
+    def test_tune(self):
+        results = tune(0.01, schemes=['sha256_crypt'], samples=1)
+        self.assertEqual([result[0] for result in results], ['sha256_crypt'])
@@ -0,0 +1,43 @@
+# Standard Lib imports
+import json
+import unittest
+from datetime import date, datetime, timedelta
+# Third-party imports
+# BITSON imports
+from app.json_backend import BACKENDS, JSONBackend
+
+
+class JSONBackendTestCase(unittest.TestCase):
+    payload = {
+        'at': datetime(2017, 2, 3, 4, 5, 6, 789),
+        'on': date(2017, 2, 3),
+        'took': timedelta(minutes=1),
+        'name': 'ñandú',
+        'items': [1, 2.5, None, True],
+    }
+    expected = {
+        'at': '2017-02-03T04:05:06.000789',
+        'on': '2017-02-03',
+        'took': 60.0,
+        'name': 'ñandú',
+        'items': [1, 2.5, None, True],
+    }
+
+    def test_backends_agree(self):
+        for name in BACKENDS:
+            try:
+                backend = JSONBackend(name)
+            except Exception:
+                continue  # not installed
+            encoded = backend.dumps(self.payload)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(json.loads(encoded.decode('utf-8')),
+                             self.expected, name)
+            self.assertEqual(backend.loads(encoded), self.expected, name)
+
+    def test_auto_fallback(self):
+        self.assertIn(JSONBackend('auto').name, BACKENDS)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(Exception):
+            JSONBackend('nope')
@@ -1,8 +1,14 @@
 # Standard Lib imports
+import json
+from datetime import datetime
 # Third-party imports
 from flask import url_for
 # BITSON imports
 from tests.test_api import APITestCaseBase
+from app.auth.login_stats import login_stats
+from app.auth.models import User
+from app.auth.tokens import tokens
+from app.extensions import db
 
 
 class LoginTestCase(APITestCaseBase):
@@ -21,8 +27,13 @@ class LoginTestCase(APITestCaseBase):
         self.assertEqual(response.status_code, 200)
         self.token = response.json['data']['token']
         self.assertIsNotNone(response.json['data']['token'])
+        self.assertIsNotNone(response.json['data']['refresh_token'])
         self.assertTrue(
             response.json['data']['expiration'] == self.app.config.get(
+                'ACCESS_TOKEN_TTL')
+        )
+        self.assertTrue(
+            response.json['data']['refresh_expiration'] == self.app.config.get(
                 'SESSION_TTL')
         )
 
@@ -33,9 +44,38 @@ class LoginTestCase(APITestCaseBase):
         self.assertIsNotNone(response.json['data']['token'])
         self.assertTrue(
             response.json['data']['expiration'] == self.app.config.get(
-                'SESSION_TTL')
+                'ACCESS_TOKEN_TTL')
         )
 
+    def test_login_count(self):
+        login_count = User.get_by(username='bitson').login_count
+        response = self.login(username_or_email='bitson', password='bitson')
+        self.assertEqual(response.status_code, 200)
+        user = User.get_by(username='bitson')
+        self.assertEqual(user.login_count, login_count + 1)
+        self.assertIsNotNone(user.last_login_at)
+
+    def test_login_count_write_behind(self):
+        login_count = User.get_by(username='bitson').login_count
+        login_stats.enabled = True
+        try:
+            self.login(username_or_email='bitson', password='bitson')
+            self.login(username_or_email='bitson', password='bitson')
+            self.assertEqual(User.get_by(username='bitson').login_count,
+                             login_count)
+            login_stats.flush()
+        finally:
+            login_stats.enabled = False
+        db.session.expire_all()
+        self.assertEqual(User.get_by(username='bitson').login_count,
+                         login_count + 2)
+
+    def test_get_by_email_or_username(self):
+        by_email = User.get_by_email_or_username(email='info@bitson.com.ar')
+        by_username = User.get_by_email_or_username(username='bitson')
+        self.assertEqual(by_email.id, by_username.id)
+        self.assertIsNone(User.get_by_email_or_username())
+
     def test_login_bad_username(self):
         response = self.login(username_or_email='bad_username',
                               password='bitson')
@@ -81,3 +121,68 @@ class LoginTestCase(APITestCaseBase):
         self.assertEqual(response.status_code, 200)
         self.assertIsNotNone(response.json['data']['token'])
         self.assertIsNotNone(response.json['data']['expiration'])
+
+    def get_token(self, token):
+        url = url_for('auth.get_token', _external=True)
+        return self.client.get(url, content_type=self.JSON,
+                               headers=self.set_api_headers(token=token))
+
+    def test_get_token_revoked(self):
+        response = self.login(username_or_email='bitson', password='bitson')
+        token = response.json['data']['token']
+        User.get_by(username='bitson').revoke_tokens()
+        response = self.get_token(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.get_json_response(response)['error'],
+                         'unauthorized')
+
+    def test_get_token_inactive_user(self):
+        user = User.create_with_role(username='leito', password='leito',
+                                     role='user', email='leito@demouser.com',
+                                     confirmed=True,
+                                     confirmed_at=datetime.now())
+        token = user.generate_access_token().decode('utf-8')
+        self.assertEqual(self.get_token(token).status_code, 200)
+        user.set_inactive()
+        self.assertEqual(self.get_token(token).status_code, 401)
+        User.remove_fake(item=user)
+
+    def refresh(self, refresh_token):
+        url = url_for('auth.refresh', _external=True)
+        response = self.client.post(url, content_type=self.JSON,
+                                    headers=self.set_api_headers(),
+                                    data=json.dumps(
+                                        {'refresh_token': refresh_token}),
+                                    )
+        response.json = self.get_json_response(response)
+        return response
+
+    def test_refresh(self):
+        response = self.login(username_or_email='bitson', password='bitson')
+        response = self.refresh(response.json['data']['refresh_token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json['data']['token'])
+        self.assertTrue(
+            response.json['data']['expiration'] == self.app.config.get(
+                'ACCESS_TOKEN_TTL')
+        )
+
+    def test_refresh_with_access_token(self):
+        response = self.login(username_or_email='bitson', password='bitson')
+        response = self.refresh(response.json['data']['token'])
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue(response.json['error'] == 'unauthorized')
+
+    def test_refresh_revoked(self):
+        response = self.login(username_or_email='bitson', password='bitson')
+        refresh_token = response.json['data']['refresh_token']
+        User.get_by(username='bitson').revoke_tokens()
+        response = self.refresh(refresh_token)
+        self.assertEqual(response.status_code, 401)
+
+    def test_access_token_without_db(self):
+        response = self.login(username_or_email='bitson', password='bitson')
+        token = response.json['data']['token']
+        claims, header = tokens.loads(token, 'access')
+        self.assertEqual(header['pur'], 'access')
+        self.assertIn('root', claims['roles'])
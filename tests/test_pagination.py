@@ -0,0 +1,94 @@
+# Standard Lib imports
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import User
+from app.pagination import encode_cursor, decode_cursor
+
+
+class PaginationTestCase(APITestCaseBase):
+    def get_page(self, url):
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(
+                                       token=self.auth_token),
+                                   )
+        response.json = self.get_json_response(response)
+        return response
+
+    def test_cursor_roundtrip(self):
+        cursor = encode_cursor({'id': 42})
+        self.assertEqual(decode_cursor(cursor), {'id': 42})
+
+    def test_users_pages(self):
+        self.login()
+        total = User.query.filter_by(erased=False).count()
+        url = url_for('auth.get_users', limit=2, _external=True)
+        ids = list()
+        while url:
+            response = self.get_page(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json['data']), 2)
+            ids.extend(item['id'] for item in response.json['data'])
+            url = response.json['next']
+        self.assertEqual(len(ids), total)
+        self.assertEqual(ids, sorted(ids))
+
+    def test_limit_is_capped(self):
+        self.login()
+        url = url_for('auth.get_users', limit=10000, _external=True)
+        response = self.get_page(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(response.json['data']),
+                             User.max_results_per_page)
+
+    def test_invalid_cursor(self):
+        self.login()
+        url = url_for('auth.get_roles', cursor='not-a-cursor', _external=True)
+        response = self.get_page(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json['error'] == 'bad request')
+
+    def test_invalid_limit(self):
+        self.login()
+        url = url_for('auth.get_role_groups', limit=0, _external=True)
+        response = self.get_page(url)
+        self.assertEqual(response.status_code, 400)
+
+    def test_users_stream(self):
+        self.login()
+        self.app.config['STREAM_BATCH_SIZE'] = 2
+        total = User.query.filter_by(erased=False).count()
+        url = url_for('auth.get_users', stream=1, _external=True)
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(
+                                       token=self.auth_token),
+                                   )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        response.json = self.get_json_response(response)
+        self.assertIsNone(response.json['next'])
+        ids = [item['id'] for item in response.json['data']]
+        self.assertEqual(len(ids), total)
+        self.assertEqual(ids, sorted(ids))
+        self.assertNotIn('password_hash', response.json['data'][0])
+
+    def test_stream_flag(self):
+        self.login()
+        for value, streamed in [('0', False), ('false', False),
+                                ('no', False), ('true', True)]:
+            url = url_for('auth.get_users', stream=value, _external=True)
+            response = self.client.get(url, content_type=self.JSON,
+                                       headers=self.set_api_headers(
+                                           token=self.auth_token),
+                                       )
+            self.assertEqual(response.status_code, 200)
+            # Only buffered responses know their length up front.
+            self.assertEqual('Content-Length' not in response.headers,
+                             streamed, value)
+        url = url_for('auth.get_users', stream='maybe', _external=True)
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(
+                                       token=self.auth_token),
+                                   )
+        self.assertEqual(response.status_code, 400)
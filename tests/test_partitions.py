@@ -0,0 +1,62 @@
+# Standard Lib imports
+import unittest
+from datetime import datetime
+# Third-party imports
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.event_logs.partitions import (add_months, create_partitions,
+                                       drop_partitions, is_partitioned,
+                                       partition_for, partitions)
+from app.extensions import db
+
+
+class PartitionBoundsTestCase(unittest.TestCase):
+    def test_add_months(self):
+        self.assertEqual(add_months(datetime(2017, 11, 1), 3),
+                         datetime(2018, 2, 1))
+        self.assertEqual(add_months(datetime(2017, 1, 1), -1),
+                         datetime(2016, 12, 1))
+
+    def test_monthly(self):
+        partition = partition_for(datetime(2017, 2, 24, 11, 5))
+        self.assertEqual(partition.name, 'event_logs_y2017m02')
+        self.assertEqual((partition.start, partition.end),
+                         (datetime(2017, 2, 1), datetime(2017, 3, 1)))
+
+    def test_quarterly(self):
+        partition = partition_for(datetime(2017, 5, 31), months=3)
+        self.assertEqual(partition.name, 'event_logs_y2017m04')
+        self.assertEqual(partition.end, datetime(2017, 7, 1))
+
+
+class PartitionManagementTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        self.connection = db.engine.connect()
+        self.transaction = self.connection.begin()
+        if not is_partitioned(self.connection):
+            self.skipTest('event_logs is not partitioned')
+
+    def tearDown(self):
+        self.transaction.rollback()
+        self.connection.close()
+        super().tearDown()
+
+    def test_create_and_drop(self):
+        now = datetime(2031, 6, 15)
+        created = create_partitions(self.connection, ahead=2, now=now)
+        self.assertEqual([partition.name for partition in created],
+                         ['event_logs_y2031m06', 'event_logs_y2031m07',
+                          'event_logs_y2031m08'])
+        self.assertEqual(create_partitions(self.connection, ahead=2,
+                                           now=now), [])
+        names = [partition.name for partition in partitions(self.connection)]
+        self.assertIn('event_logs_y2031m07', names)
+
+        dropped = drop_partitions(self.connection, retention=1,
+                                  now=datetime(2031, 9, 1))
+        self.assertIn('event_logs_y2031m06', [partition.name
+                                              for partition in dropped])
+        names = [partition.name for partition in partitions(self.connection)]
+        self.assertNotIn('event_logs_y2031m07', names)
+        self.assertIn('event_logs_y2031m08', names)
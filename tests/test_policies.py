@@ -0,0 +1,158 @@
+# Standard Lib imports
+import json
+import os
+import tempfile
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import User
+from app.event_logs.models import EventLog
+from app.event_logs.policies import (LoggingPolicies, logging_policies,
+                                     make_policy, resolve)
+from app.event_logs.writer import event_log_writer
+from app.extensions import db
+
+
+class LoggingPoliciesTestCase(APITestCaseBase):
+    config = {
+        '*': {'mode': 'never'},
+        'auth': {'mode': 'errors'},
+        '/auth/users/*': {'mode': 'always'},
+        'auth.get_user': {'mode': 'sample', 'rate': 0.5, 'response': False},
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.app.config['EVENT_LOG_POLICIES'] = self.config
+        self.app.config['EVENT_LOG_POLICY_FILE'] = None
+        self.policies = LoggingPolicies()
+        self.policies.init_app(self.app)
+
+    def test_most_specific_wins(self):
+        self.assertEqual(self.policies.get('auth.get_user').mode, 'sample')
+        self.assertFalse(self.policies.get('auth.get_user').response)
+        self.assertEqual(self.policies.get('auth.get_users').mode, 'always')
+        self.assertEqual(self.policies.get('auth.get_roles').mode, 'errors')
+        self.assertEqual(self.policies.get('main.index').mode, 'never')
+        self.assertEqual(self.policies.get(None).mode, 'never')
+
+    def test_should_log(self):
+        policies = self.policies
+        self.assertTrue(policies.should_log(make_policy({'mode': 'always'}),
+                                            'GET', 200))
+        self.assertFalse(policies.should_log(make_policy({'mode': 'never'}),
+                                             'POST', 500))
+        errors = make_policy({'mode': 'errors'})
+        self.assertFalse(policies.should_log(errors, 'POST', 201))
+        self.assertTrue(policies.should_log(errors, 'GET', 404))
+        default = make_policy({'mode': 'default'})
+        self.assertTrue(policies.should_log(default, 'POST', 201))
+        self.assertFalse(policies.should_log(default, 'GET', 200))
+        self.assertFalse(policies.should_log(
+            make_policy({'mode': 'sample', 'rate': 0}), 'GET', 200))
+
+    def test_invalid(self):
+        for value in [{'mode': 'sometimes'}, {'mode': 'sample', 'rate': 2},
+                      {'store': True}]:
+            with self.assertRaises(ValueError):
+                resolve({'*': value}, self.app.url_map)
+
+    def test_reload_file(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'main.index': {'mode': 'always'}}, f)
+        self.app.config['EVENT_LOG_POLICY_FILE'] = path
+        self.app.config['EVENT_LOG_POLICY_RELOAD_INTERVAL'] = 0
+        self.policies.init_app(self.app)
+        self.assertEqual(self.policies.get('main.index').mode, 'always')
+
+        with open(path, 'w') as f:
+            json.dump({'main.index': {'mode': 'errors'}}, f)
+        os.utime(path, (0, 0))
+        self.assertEqual(self.policies.get('main.index').mode, 'errors')
+
+        for number, broken in enumerate([
+                '{broken', '["not", "an", "object"]', '{"main.index": 5}',
+                '{"main.index": {"rate": "x"}}'], start=1):
+            with open(path, 'w') as f:
+                f.write(broken)
+            os.utime(path, (number, number))
+            self.assertEqual(self.policies.get('main.index').mode, 'errors')
+
+    def test_broken_file_at_startup(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            f.write('[]')
+        self.app.config['EVENT_LOG_POLICY_FILE'] = path
+        self.policies.init_app(self.app)
+        self.assertEqual(self.policies.get('auth.get_roles').mode, 'errors')
+
+
+class AfterRequestLoggingTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        self.app.config['EVENT_LOG_ENABLED'] = True
+        self.app.config['EVENT_LOG_POLICIES'] = {
+            '*': {'mode': 'never'},
+            '/auth/users/*': {'mode': 'always'},
+            'auth.test_view': {'mode': 'always'},
+        }
+        self.app.config['EVENT_LOG_POLICY_FILE'] = None
+        logging_policies.init_app(self.app)
+        event_log_writer.enabled = False  # write within the request
+        self.url = url_for('auth.get_users', _external=True)
+        self.secret_url = url_for('auth.test_view', _external=True)
+
+    def tearDown(self):
+        event_log_writer.enabled = True
+        EventLog.query.filter(EventLog.url.in_(
+            [self.url, self.secret_url])).delete(synchronize_session=False)
+        db.session.commit()
+        super().tearDown()
+
+    def logged(self):
+        db.session.expire_all()
+        return EventLog.query.filter_by(url=self.url).all()
+
+    def test_unauthorized_is_logged(self):
+        for headers in [self.set_api_headers(),
+                        self.set_api_headers(token='not a token'),
+                        self.set_api_headers(token='not a token')]:
+            response = self.client.get(self.url, headers=headers)
+            self.assertEqual(response.status_code, 401)
+        logged = self.logged()
+        self.assertEqual(len(logged), 3)
+        self.assertEqual(set(item.user_id for item in logged), {0})
+        self.assertEqual(logged[0].response['status code'], 401)
+
+    def test_authorized_is_logged(self):
+        self.login()
+        response = self.client.get(self.url, headers=self.set_api_headers(
+            token=self.auth_token))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(self.logged()[0].user_id, 0)
+
+    def test_user_is_not_loaded_to_be_logged(self):
+        self.login()
+        headers = self.set_api_headers(token=self.auth_token)
+        self.client.get(self.secret_url, headers=headers)  # warm up
+        with self.count_queries() as statements:
+            response = self.client.get(self.secret_url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([statement for statement in statements
+                          if 'FROM auth_users' in statement], [])
+        db.session.expire_all()
+        logged = EventLog.query.filter_by(url=self.secret_url).all()
+        self.assertEqual(len(logged), 2)
+        self.assertEqual(logged[0].user_id,
+                         User.get_by(username='bitson').id)
+
+    def test_other_methods_are_not_logged(self):
+        for method in ('HEAD', 'OPTIONS'):
+            response = self.client.open(self.url, method=method,
+                                        headers=self.set_api_headers())
+            self.assertLess(response.status_code, 500)
+        self.assertEqual(self.logged(), [])
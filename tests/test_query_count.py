@@ -0,0 +1,57 @@
+# Standard Lib imports
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import User, Role, RoleGroup
+from app.auth.revocation import revocations
+from app.response_cache import response_cache
+
+
+class QueryCountTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+        # Keeps the revocation list refresh out of the counted queries.
+        revocations.refresh()
+        revocations.refresh_interval = 3600
+        # Cached responses would skip the queries under test.
+        response_cache.backend = None
+
+    def get(self, url):
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(
+                                       token=self.auth_token),
+                                   )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def count_list_queries(self, endpoint, limit):
+        url = url_for(endpoint, limit=limit, _external=True)
+        self.get(url)  # warm up: token verification & caches
+        with self.count_queries() as statements:
+            self.get(url)
+        self.assertGreater(len(statements), 0)
+        return len(statements)
+
+    def assertConstantQueries(self, endpoint, model):
+        self.assertGreater(model.query.filter_by(erased=False).count(), 1)
+        limit = model.max_results_per_page
+        self.assertEqual(self.count_list_queries(endpoint, limit=1),
+                         self.count_list_queries(endpoint, limit=limit))
+
+    def test_users_list(self):
+        self.assertConstantQueries('auth.get_users', User)
+
+    def test_roles_list(self):
+        self.assertConstantQueries('auth.get_roles', Role)
+
+    def test_role_groups_list(self):
+        self.assertConstantQueries('auth.get_role_groups', RoleGroup)
+
+    def test_user_detail(self):
+        user = User.get_by(username='bitson')
+        url = url_for('auth.get_user', item_id=user.id, _external=True)
+        self.get(url)
+        with self.assertNumQueries(3):  # validators, user & its roles
+            self.get(url)
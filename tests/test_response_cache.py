@@ -0,0 +1,80 @@
+# Standard Lib imports
+import unittest
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import Role
+from app.auth.revocation import revocations
+from app.extensions import db
+from app.metrics import metrics
+from app.response_cache import response_cache, RedisBackend
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class ResponseCacheTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+        self.login()
+        revocations.refresh()
+        revocations.refresh_interval = 3600
+
+    def get(self, url, **headers):
+        return self.client.get(url, content_type=self.JSON,
+                               headers=self.set_api_headers(
+                                   token=self.auth_token, **headers),
+                               )
+
+    def test_hit(self):
+        url = url_for('auth.get_roles', _external=True)
+        hits = metrics.counter('response_cache.hits')
+        first = self.get(url)
+        with self.assertNumQueries(0):
+            second = self.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(metrics.counter('response_cache.hits'), hits + 1)
+
+    def test_hit_not_modified(self):
+        url = url_for('auth.get_role_groups', _external=True)
+        etag = self.get(url).headers.get('ETag')
+        response = self.get(url, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidated_on_commit(self):
+        role = Role.get_by(name='user')
+        url = url_for('auth.get_role', item_id=role.id, _external=True)
+        self.get(url)
+        description = role.description
+        role.description = 'Cached description'
+        db.session.commit()
+        response = self.get(url)
+        data = self.get_json_response(response)['data']
+        self.assertEqual(data['description'], 'Cached description')
+        role.description = description
+        db.session.commit()
+
+    def test_errors_not_cached(self):
+        url = url_for('auth.get_role', item_id=Role.get_invalid_id(),
+                      _external=True)
+        misses = metrics.counter('response_cache.misses')
+        self.assertEqual(self.get(url).status_code, 404)
+        self.assertEqual(self.get(url).status_code, 404)
+        self.assertEqual(metrics.counter('response_cache.misses'),
+                         misses + 2)
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis is not installed')
+class RedisResponseCacheTestCase(ResponseCacheTestCase):
+    def setUp(self):
+        self.backend = response_cache.backend
+        super().setUp()
+        response_cache.backend = RedisBackend(fakeredis.FakeStrictRedis())
+
+    def tearDown(self):
+        response_cache.backend = self.backend
+        super().tearDown()
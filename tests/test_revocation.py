@@ -0,0 +1,136 @@
+# Standard Lib imports
+import json
+from datetime import datetime
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.cache import token_cache
+from app.auth.models import RevokedToken
+from app.auth.revocation import BloomFilter, revocations
+from app.extensions import db
+
+
+class BloomFilterTestCase(APITestCaseBase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = ['token-{}'.format(i) for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        for key in keys:
+            self.assertIn(key, bloom)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add('token-{}'.format(i))
+        false_positives = sum('other-{}'.format(i) in bloom
+                              for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class RevocationTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        revocations.reset()
+
+    def tearDown(self):
+        RevokedToken.query.delete()
+        db.session.commit()
+        super().tearDown()
+
+    def get_secret(self, token):
+        url = url_for('auth.test_view', _external=True)
+        return self.client.get(url, content_type=self.JSON,
+                               headers=self.set_api_headers(token=token))
+
+    def logout(self, token, refresh_token=None):
+        url = url_for('auth.logout', _external=True)
+        data = {'refresh_token': refresh_token} if refresh_token else {}
+        return self.client.post(url, content_type=self.JSON,
+                                headers=self.set_api_headers(token=token),
+                                data=json.dumps(data))
+
+    def test_logout_revokes_token(self):
+        response = self.login()
+        token = self.auth_token
+        self.assertEqual(self.get_secret(token).status_code, 200)
+        response = self.logout(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_secret(token).status_code, 401)
+
+    def test_logout_keeps_other_tokens(self):
+        self.login()
+        first_token = self.auth_token
+        self.login()
+        self.logout(first_token)
+        self.assertEqual(self.get_secret(self.auth_token).status_code, 200)
+
+    def test_logout_revokes_refresh_token(self):
+        response = self.login()
+        refresh_token = response.json['data']['refresh_token']
+        self.logout(self.auth_token, refresh_token=refresh_token)
+        url = url_for('auth.refresh', _external=True)
+        response = self.client.post(url, content_type=self.JSON,
+                                    headers=self.set_api_headers(),
+                                    data=json.dumps(
+                                        {'refresh_token': refresh_token}))
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocation_from_other_process(self):
+        self.login()
+        self.assertEqual(self.get_secret(self.auth_token).status_code, 200)
+        claims = token_cache.get(token_cache.digest(self.auth_token)).claims
+        db.session.add(RevokedToken(jti=claims['jti'], user_id=claims['id']))
+        db.session.commit()
+        revocations.refresh()
+        self.assertEqual(self.get_secret(self.auth_token).status_code, 401)
+
+
+class RevocationRefreshTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        revocations.reset()
+        self.base = (db.session.query(db.func.max(RevokedToken.id)).scalar()
+                     or 0) + 1000
+
+    def tearDown(self):
+        RevokedToken.query.delete()
+        db.session.commit()
+        revocations.reset()
+        super().tearDown()
+
+    def add(self, offset, jti):
+        db.session.add(RevokedToken(id=self.base + offset, jti=jti,
+                                    created_on=datetime.utcnow()))
+        db.session.commit()
+
+    def test_ids_committed_out_of_order(self):
+        self.add(2, 'committed-first')
+        revocations.refresh()
+        self.assertIn('committed-first', revocations.bloom)
+        self.add(1, 'committed-later')  # lower id, committed afterwards
+        revocations.refresh()
+        self.assertIn('committed-later', revocations.bloom)
+        self.assertTrue(revocations.is_revoked('committed-later'))
+
+    def test_overlap_is_not_counted_twice(self):
+        self.add(1, 'only-once')
+        revocations.refresh()
+        count = revocations.bloom.count
+        revocations.refresh()
+        self.assertEqual(revocations.bloom.count, count)
+
+    def test_rebuild_sized_from_rows(self):
+        revocations.capacity = 2
+        revocations.reset()
+        for offset in range(5):
+            self.add(offset, 'jti-{}'.format(offset))
+        revocations.refresh()
+        self.assertGreaterEqual(revocations.bloom.capacity, 10)
+        rebuilt = revocations.bloom
+        self.add(5, 'jti-5')
+        revocations.refresh()
+        self.assertIs(revocations.bloom, rebuilt)  # no rebuild this time
+        self.assertIn('jti-5', revocations.bloom)
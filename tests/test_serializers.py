@@ -0,0 +1,56 @@
+# Standard Lib imports
+from datetime import date, time, datetime, timedelta
+# Third-party imports
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import User, Role, RoleGroup
+from app.extensions import db
+from app.json_backend import dumps, loads
+from app.serializers import get_serializer
+
+
+def legacy_export_data(item, exclude=None):
+    """`AppModel.export_data` as it was before compiled serializers."""
+    response = dict()
+    for attr, value in item.__dict__.items():
+        if attr.startswith('_'):
+            continue
+        if exclude and attr in exclude:
+            continue
+        if isinstance(value, (date, time, datetime)):
+            value = value.isoformat()
+        if isinstance(value, timedelta):
+            value = value.total_seconds()
+        response.update({attr: value})
+    return response
+
+
+class SerializersTestCase(APITestCaseBase):
+    def assertSameExport(self, model, exclude=None):
+        db.session.expire_all()
+        items = model.query.all()
+        self.assertTrue(items)
+        serializer = get_serializer(model, exclude)
+        for item in items:
+            self.assertEqual(loads(dumps(serializer(item))),
+                             legacy_export_data(item, exclude=exclude))
+
+    def test_users(self):
+        self.assertSameExport(User, exclude=['password_hash'])
+
+    def test_roles(self):
+        self.assertSameExport(Role)
+
+    def test_role_groups(self):
+        self.assertSameExport(RoleGroup)
+
+    def test_serializer_is_cached(self):
+        self.assertIs(get_serializer(User, ['password_hash']),
+                      get_serializer(User, ('password_hash', )))
+
+    def test_expired_item(self):
+        user = User.get_by(username='bitson')
+        db.session.expire(user)
+        data = user.export_data(exclude=['password_hash'])
+        self.assertEqual(data['username'], 'bitson')
+        self.assertNotIn('password_hash', data)
@@ -0,0 +1,76 @@
+# Standard Lib imports
+from datetime import datetime
+# Third-party imports
+from flask import url_for
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.cache import token_cache, rejected_tokens
+from app.auth.models import User
+from app.metrics import metrics
+
+
+class TokenCacheTestCase(APITestCaseBase):
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        rejected_tokens.clear()
+
+    def get_secret(self, token):
+        url = url_for('auth.test_view', _external=True)
+        return self.client.get(url, content_type=self.JSON,
+                               headers=self.set_api_headers(token=token))
+
+    def test_token_is_cached(self):
+        self.login()
+        self.assertEqual(len(token_cache), 0)
+        response = self.get_secret(self.auth_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_cache), 1)
+        response = self.get_secret(self.auth_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_cache), 1)
+
+    def test_invalid_token_not_cached(self):
+        response = self.get_secret('invalid-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(token_cache), 0)
+
+    def test_invalid_token_rejected_from_cache(self):
+        rejected = metrics.counter('auth.rejected_cached')
+        response = self.get_secret('invalid-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(rejected_tokens), 1)
+        response = self.get_secret('invalid-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.get_json_response(response)['error'],
+                         'unauthorized')
+        self.assertEqual(metrics.counter('auth.rejected_cached'), rejected + 1)
+
+    def test_inactive_user_token_not_rejected_from_cache(self):
+        user = User.create_with_role(username='leito', password='leito',
+                                     role='user', email='leito@demouser.com',
+                                     confirmed=True,
+                                     confirmed_at=datetime.now())
+        token = user.generate_auth_token(3600)
+        user.set_inactive()
+        self.assertEqual(self.get_secret(token).status_code, 401)
+        self.assertEqual(len(rejected_tokens), 0)
+        user.set_active()
+        self.assertEqual(self.get_secret(token).status_code, 200)
+        User.remove_fake(item=user)
+
+    def test_user_change_evicts_token(self):
+        user = User.create_with_role(username='leito', password='leito',
+                                     role='user', email='leito@demouser.com',
+                                     confirmed=True,
+                                     confirmed_at=datetime.now())
+        token = user.generate_auth_token(3600)
+        response = self.get_secret(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_cache), 1)
+
+        user.set_inactive()
+        self.assertEqual(len(token_cache), 0)
+        response = self.get_secret(token)
+        self.assertEqual(response.status_code, 401)
+        User.remove_fake(item=user)
@@ -0,0 +1,35 @@
+# Standard Lib imports
+# Third-party imports
+# BITSON imports
+from tests.test_api import APITestCaseBase
+from app.auth.models import User
+from app.auth.tokens import TokenService
+
+
+class TokenServiceTestCase(APITestCaseBase):
+    def make_service(self, *keys):
+        service = TokenService()
+        self.app.config['SECRET_KEYS'] = list(keys)
+        service.init_app(self.app)
+        return service
+
+    def test_purposes_not_interchangeable(self):
+        user = User.get_by(username='bitson')
+        reset_token = user.generate_reset_token(3600)
+        self.assertIsNone(User.load_auth_token(reset_token))
+        auth_token = user.generate_auth_token(3600)
+        self.assertFalse(User.verify_reset_password_token(auth_token))
+
+    def test_key_rotation(self):
+        old = self.make_service('old-key')
+        token = old.dumps('auth', {'id': 1}, expires_in=60)
+        rotated = self.make_service('new-key', 'old-key')
+        payload, _ = rotated.loads(token, 'auth')
+        self.assertEqual(payload['id'], 1)
+        retired = self.make_service('new-key')
+        self.assertIsNone(retired.load(token, 'auth'))
+
+    def test_expired_token(self):
+        service = self.make_service('key')
+        token = service.dumps('auth', {'id': 1}, expires_in=-1)
+        self.assertIsNone(service.load(token, 'auth'))
@@ -156,3 +156,25 @@ class UserRoleEditionTestCase(APITestCaseBase):
         self.assertEqual(response.status_code, 204)
         User.remove_fake(item=user)
         Role.remove_fake(item=role)
+
+    def test_token_embeds_roles(self):
+        user = User.get_by(username='bitson')
+        token = user.generate_auth_token(3600, with_roles=True)
+        claims, _ = User.load_auth_token(token)
+        self.assertEqual(sorted(claims['roles']),
+                         sorted(user.list_roles_names()))
+        self.assertEqual(claims['pv'], user.permissions_version)
+
+    def test_revoked_token(self):
+        token = User.get_by(username='bitson').generate_auth_token(
+            3600, with_roles=True)
+        url = url_for('auth.test_roles_accepted', _external=True)
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(token=token),
+                                   )
+        self.assertEqual(response.status_code, 200)
+        User.get_by(username='bitson').revoke_tokens()
+        response = self.client.get(url, content_type=self.JSON,
+                                   headers=self.set_api_headers(token=token),
+                                   )
+        self.assertEqual(response.status_code, 401)